@@ -14,10 +14,22 @@ GameBoard:
         
         draw(self):
             Redraws the board.
+
+        render(self):
+            Recolours the cells that changed since the last redraw.
+
+        showStatus(self, geometry, status):
+            Recolours the cells to show a board given by its cell values.
+
+        watch(self, frames, fps=30):
+            Keeps showing the latest board published to a queue of frames.
 """
 
+import queue
 import tkinter as tk
 
+from geometry import get_geometry
+
 
 class GameBoard(tk.Frame):
 
@@ -33,6 +45,11 @@ class GameBoard(tk.Frame):
         self.color5 = color5
         self.board = board
         self.pieces = {}
+        # cell value -> fill colour: empty, player 1, player 2, and their special pieces
+        self.color_table = (color3, color1, color2, color4, color5)
+        self.geometry = None
+        self.items = []
+        self.shown = bytearray()
         canvas_width = columns * size / 2
         canvas_height = rows * size
         tk.Frame.__init__(self, parent)
@@ -42,102 +59,91 @@ class GameBoard(tk.Frame):
 
     def refresh(self, event):
         """Redraw the board, possibly in response to window being resized"""
-        xsize = 31
-        ysize = 24
-        self.size = min(xsize, ysize)
-        self.canvas.delete('square')
-        color = self.color2
-        for row in range(1, self.board.size + 1):
-            for col in range(1, self.board.getColNum(row) + 1):
-                if str(self.board.board_status[(row, col)]) == '0':
-                    color = self.color3
-                if str(self.board.board_status[(row, col)]) == '1':
-                    color = self.color1
-                if str(self.board.board_status[(row, col)]) == '2':
-                    color = self.color2
-                if str(self.board.board_status[(row, col)]) == '3':
-                    color = self.color4
-                if str(self.board.board_status[(row, col)]) == '4':
-                    color = self.color5
-                x1 = (col + (self.board.size - row)) * self.size
-                y1 = row * self.size
-                x2 = x1 + self.size
-                y2 = y1 + self.size
-                if col != 1:
-                    x1 = x1 + (col - 1) * self.size
-                    x2 = x2 + (col - 1) * self.size
-                self.canvas.create_oval(x1, y1, x2, y2, outline='black', fill=color, tags='square')
-
-        for row in range(self.board.size + 1, self.board.size * 2):
-            for col in range(1, self.board.getColNum(row) + 1):
-                if str(self.board.board_status[(row, col)]) == '0':
-                    color = self.color3
-                if str(self.board.board_status[(row, col)]) == '1':
-                    color = self.color1
-                if str(self.board.board_status[(row, col)]) == '2':
-                    color = self.color2
-                if str(self.board.board_status[(row, col)]) == '3':
-                    color = self.color4
-                if str(self.board.board_status[(row, col)]) == '4':
-                    color = self.color5
-                x1 = (col + (row - self.board.size)) * self.size
-                y1 = row * self.size
-                x2 = x1 + self.size
-                y2 = y1 + self.size
-                if col != 1:
-                    x1 = x1 + (col - 1) * self.size
-                    x2 = x2 + (col - 1) * self.size
-                self.canvas.create_oval(x1, y1, x2, y2, outline='black', fill=color, tags='square')
+        self.render()
 
     def draw(self):
         """Redraw the board"""
+        self.render()
+
+    def render(self):
+        """
+        Brings the canvas up to date with self.board.
+
+        The canvas keeps one oval per cell, created on the first render or when the board
+        configuration changes. Later renders only recolour the cells whose value changed
+        since the previous one.
+        """
+        self.showStatus(self.board.geometry, self.board.status)
+
+    def showStatus(self, geometry, status):
+        """
+        Brings the canvas up to date with a board given by its cell values.
+
+        Args:
+            geometry (BoardGeometry): The board configuration.
+            status (bytes): The value of every cell, as in Board.status.
+        """
+        if self.geometry is not geometry:
+            self._createCells(geometry, status)
+        shown = self.shown
+        itemconfig = self.canvas.itemconfig
+        for cell, value in enumerate(status):
+            if value != shown[cell]:
+                itemconfig(self.items[cell], fill=self.color_table[value])
+        self.shown[:] = status
+
+    def _createCells(self, geometry, status):
+        """
+        Creates the ovals of all cells of a board configuration, replacing any old ones.
+
+        Args:
+            geometry (BoardGeometry): The board configuration to draw.
+            status (bytes): The value of every cell.
+        """
         xsize = 31
         ysize = 24
-        # self.board.printBoard()
         self.size = min(xsize, ysize)
         self.canvas.delete('square')
-        color = self.color2
-        for row in range(1, self.board.size + 1):
-            for col in range(1, self.board.getColNum(row) + 1):
-                if str(self.board.board_status[(row, col)]) == '0':
-                    color = self.color3
-                if str(self.board.board_status[(row, col)]) == '1':
-                    color = self.color1
-                if str(self.board.board_status[(row, col)]) == '2':
-                    color = self.color2
-                if str(self.board.board_status[(row, col)]) == '3':
-                    color = self.color4
-                if str(self.board.board_status[(row, col)]) == '4':
-                    color = self.color5
-                x1 = (col + (self.board.size - row)) * self.size
-                y1 = row * self.size
-                x2 = x1 + self.size
-                y2 = y1 + self.size
-                if col != 1:
-                    x1 = x1 + (col - 1) * self.size
-                    x2 = x2 + (col - 1) * self.size
-                self.canvas.create_oval(x1, y1, x2, y2, outline='black', fill=color, tags='square')
-
-        for row in range(self.board.size + 1, self.board.size * 2):
-            for col in range(1, self.board.getColNum(row) + 1):
-                if str(self.board.board_status[(row, col)]) == '0':
-                    color = self.color3
-                if str(self.board.board_status[(row, col)]) == '1':
-                    color = self.color1
-                if str(self.board.board_status[(row, col)]) == '2':
-                    color = self.color2
-                if str(self.board.board_status[(row, col)]) == '3':
-                    color = self.color4
-                if str(self.board.board_status[(row, col)]) == '4':
-                    color = self.color5
-                x1 = (col + (row - self.board.size)) * self.size
-                y1 = row * self.size
-                x2 = x1 + self.size
-                y2 = y1 + self.size
-                if col != 1:
-                    x1 = x1 + (col - 1) * self.size
-                    x2 = x2 + (col - 1) * self.size
-                self.canvas.create_oval(x1, y1, x2, y2, outline='black', fill=color, tags='square')
+        board_size = geometry.size
+        # cell -> canvas item of the cell
+        self.items = []
+        for cell, (row, col) in enumerate(geometry.positions):
+            x1 = (col + abs(board_size - row)) * self.size + (col - 1) * self.size
+            y1 = row * self.size
+            x2 = x1 + self.size
+            y2 = y1 + self.size
+            self.items.append(
+                self.canvas.create_oval(
+                    x1, y1, x2, y2, outline='black', fill=self.color_table[status[cell]], tags='square'
+                )
+            )
+        # cell -> value the cell is drawn with
+        self.shown = bytearray(status)
+        self.geometry = geometry
+
+    def watch(self, frames, fps=30):
+        """
+        Shows the boards of games running elsewhere, polling from the Tk event loop.
+
+        At most fps times a second, the queue is drained and only the newest frame is
+        drawn, so a viewer that falls behind skips stale boards instead of slowing the
+        games down.
+
+        Args:
+            frames (Queue): Frames of (board size, piece rows, cell values), see
+                runGame.publishFrame.
+            fps (int): The maximum number of redraws per second.
+        """
+        latest = None
+        try:
+            while True:
+                latest = frames.get_nowait()
+        except queue.Empty:
+            pass
+        if latest is not None:
+            size, piece_rows, status = latest
+            self.showStatus(get_geometry(size, piece_rows), status)
+        self.after(max(1, int(1000 / fps)), self.watch, frames, fps)
 
 
 # okay decompiling UI.pyc
@@ -1,12 +1,37 @@
+import concurrent.futures
+import logging
+import math
 import random
+import time
 import game
 
-from typing import Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from transposition import TranspositionTable, TT_EXACT, TT_LOWER, TT_UPPER
+
+logger = logging.getLogger(__name__)
+
+# Share of the time budget of a move that searching agents plan to use, and the time in
+# seconds they keep back at least, for overshooting their deadline and for passing the
+# move back to the time control.
+TIME_BUDGET_SHARE = 0.8
+TIME_BUDGET_MARGIN = 0.015
 
 class Agent(object):
     """
     Base class for all agents.
+
+    Agents may follow an anytime protocol, used by the time control of
+    timecontrol.TimedAgent: before each move, time_budget is set to the seconds the move
+    may take (None without a limit), and the agent may report its best move so far with
+    report, which is played if it runs out of time. After a move, timed_out tells
+    whether the time ran out, or the agent was lost for the move, e.g. when its worker
+    process died.
     """
+    time_budget: Optional[float] = None
+    reporter: Optional[Callable[[game.Action], None]] = None
+    timed_out = False
+
     def __init__(self, game: game.ChineseChecker):
         """
         Initializes the agent with the game instance.
@@ -27,6 +52,40 @@ class Agent(object):
         """
         raise Exception("Not implemented yet")
 
+    def report(self, action: game.Action) -> None:
+        """
+        Reports the best move found so far for the move being searched.
+        """
+        if self.reporter is not None:
+            self.reporter(action)
+
+    def timeLimit(self, time_limit: Optional[float]) -> Optional[float]:
+        """
+        Returns the agent's own time limit, capped by the time budget of the move. None
+        stands for no limit.
+        """
+        if self.time_budget is None:
+            return time_limit
+        budget = max(
+            0.0,
+            min(self.time_budget * TIME_BUDGET_SHARE, self.time_budget - TIME_BUDGET_MARGIN),
+        )
+        if time_limit is None:
+            return budget
+        return min(time_limit, budget)
+
+    def newGame(self) -> None:
+        """
+        Called before each game. Does nothing by default.
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Releases the resources held by the agent. Does nothing by default.
+        """
+        pass
+
 
 class RandomAgent(Agent):
     """
@@ -55,17 +114,25 @@ class SimpleGreedyAgent(Agent):
     def getAction(self, state: game.State):
         """
         Selects an action with the maximum vertical advance.
-        """
-        legal_actions = self.game.actions(state)
-        self.action = random.choice(legal_actions)
 
+        The actions are generated piece by piece, from the pieces with the most room to
+        advance, so the pieces that cannot beat the best advance found are never searched.
+        """
         player = self.game.player(state)
-        if player == 1:
-            max_vertical_advance_one_step = max([action[0][0] - action[1][0] for action in legal_actions])
-            max_actions = [action for action in legal_actions if action[0][0] - action[1][0] == max_vertical_advance_one_step]
-        else:
-            max_vertical_advance_one_step = max([action[1][0] - action[0][0] for action in legal_actions])
-            max_actions = [action for action in legal_actions if action[1][0] - action[0][0] == max_vertical_advance_one_step]
+        # the row the player advances towards
+        last_row = 1 if player == 1 else self.game.size * 2 - 1
+        max_vertical_advance_one_step = -math.inf
+        max_actions = []
+        for action in self.game.iter_actions(state, order="advance"):
+            (src_row, _), (dst_row, _) = action
+            if abs(last_row - src_row) < max_vertical_advance_one_step:
+                break
+            advance = src_row - dst_row if player == 1 else dst_row - src_row
+            if advance > max_vertical_advance_one_step:
+                max_vertical_advance_one_step = advance
+                max_actions = [action]
+            elif advance == max_vertical_advance_one_step:
+                max_actions.append(action)
         self.action = random.choice(max_actions)
 
     def oppAction(self, state: game.State):
@@ -106,4 +173,604 @@ class YourAgent(Agent):
         pass
         ##########################################
         # write your own implementation here
-        ##########################################
\ No newline at end of file
+        ##########################################
+
+def progress_score(board) -> float:
+    """
+    A heuristic score of a position from player 1's point of view.
+
+    It is the difference in total vertical progress towards the goal corners, plus the
+    pieces already in the goal, which also decide games that run out of iterations.
+    """
+    rows = board.geometry.row_of
+    bottom = board.size * 2
+    progress1 = sum(bottom - rows[cell] for cell in board.pieces[1])
+    progress2 = sum(rows[cell] for cell in board.pieces[2])
+    return progress1 - progress2 + 4 * (board.goal_score[1] - board.goal_score[2])
+
+
+class _SearchTimeout(Exception):
+    """
+    Raised inside a search when the move deadline has passed.
+    """
+
+
+class AlphaBetaAgent(Agent):
+    """
+    Agent that runs an iterative-deepening alpha-beta search under a per-move time budget.
+
+    The search plays moves in place with ChineseChecker.apply/undo, caches results in a
+    transposition table, and orders moves by transposition-table move, killer moves,
+    vertical advance, hops before steps and the history heuristic. When the deadline hits,
+    the best move of the deepest search so far is played.
+    """
+    WIN_SCORE = 1_000_000
+
+    def __init__(
+        self,
+        game: game.ChineseChecker,
+        time_limit: float = 0.5,
+        max_depth: int = 32,
+        tt_bits: int = 16,
+    ):
+        """
+        Initializes the agent.
+
+        Args:
+            game (ChineseChecker): The game instance.
+            time_limit (float): The wall-clock budget per move in seconds.
+            max_depth (int): The deepest iteration of the search.
+            tt_bits (int): The transposition table has 2 ** tt_bits buckets.
+        """
+        super().__init__(game)
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.params = {"time_limit": time_limit, "max_depth": max_depth, "tt_bits": tt_bits}
+        self.tt = TranspositionTable(tt_bits)
+        self.killers: Dict[int, List[game.Action]] = {}
+        self.history: Dict[game.Action, int] = {}
+        self.nodes = 0
+        self.deadline = 0.0
+        self.stats: Dict[str, float] = {}
+
+    def getAction(self, state: game.State):
+        """
+        Searches for the best move of the current player.
+        """
+        self.action = self._search(state, bonus=False)
+
+    def oppAction(self, state: game.State):
+        """
+        Searches for the best bonus move, which moves one of the opponent's pieces.
+        """
+        self.opp_action = self._search(state, bonus=True)
+
+    def _search(self, state: game.State, bonus: bool) -> game.Action:
+        # works on a copy so that a timeout can never leave the real board modified
+        start = time.perf_counter()
+        self.deadline = start + self.timeLimit(self.time_limit)
+        self.nodes = 0
+        self.killers = {}
+        self.tt.new_search()
+        root = (state[0], state[1].copy(), bonus)
+        last_action = self.action if bonus else None
+
+        moves = list(self._ordered_moves(root, 0, None))
+        best_move = moves[0]
+        self.report(best_move)
+        depth_reached = 0
+        best_value = 0.0
+        for depth in range(1, self.max_depth + 1):
+            iteration_start = time.perf_counter()
+            iteration_best = None
+            iteration_value = -math.inf
+            alpha = -math.inf
+            try:
+                for action in moves:
+                    value = self._child_value(root, action, last_action, depth, alpha, math.inf)
+                    if value > iteration_value:
+                        iteration_value, iteration_best = value, action
+                    alpha = max(alpha, value)
+            except _SearchTimeout:
+                # the previous best move is searched first, so a partial iteration's
+                # best move is at least as well founded as the previous one
+                if iteration_best is not None:
+                    best_move, best_value = iteration_best, iteration_value
+                break
+            best_move, best_value, depth_reached = iteration_best, iteration_value, depth
+            self.report(best_move)
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+            if abs(best_value) >= self.WIN_SCORE:
+                break
+            # the next iteration takes longer than this one, so if it cannot finish in
+            # the time left, its partial result is not worth the overshoot
+            now = time.perf_counter()
+            if now + (now - iteration_start) > self.deadline:
+                break
+
+        elapsed = time.perf_counter() - start
+        self.stats = {
+            "depth": depth_reached,
+            "nodes": self.nodes,
+            "nodes_per_sec": self.nodes / elapsed if elapsed > 0 else 0.0,
+            "score": best_value,
+            "time": elapsed,
+        }
+        logger.info(
+            f"AlphaBetaAgent: depth {depth_reached}, {self.nodes} nodes in {elapsed:.3f}s "
+            f"({self.stats['nodes_per_sec']:.0f} nodes/s), score {best_value}"
+        )
+        return best_move
+
+    def _child_value(
+        self,
+        state: game.State,
+        action: game.Action,
+        last_action: Optional[game.Action],
+        depth: int,
+        alpha: float,
+        beta: float,
+    ) -> float:
+        # the value of playing action in state, from the point of view of the player
+        # playing it; a pending bonus move is played by the same player
+        if state[2]:
+            child, token = self.game.opp_apply(state, action, last_action)  # type: ignore
+        else:
+            child, token = self.game.apply(state, action)
+        try:
+            if child[2]:
+                return self._negamax(child, action, depth - 1, alpha, beta)
+            return -self._negamax(child, None, depth - 1, -beta, -alpha)
+        finally:
+            self.game.undo(token)
+
+    def _negamax(
+        self,
+        state: game.State,
+        last_action: Optional[game.Action],
+        depth: int,
+        alpha: float,
+        beta: float,
+    ) -> float:
+        # value of state for the player to act: the opponent of state[0] while a bonus
+        # move is pending, state[0] otherwise
+        self.nodes += 1
+        if self.nodes & 31 == 0 and time.perf_counter() > self.deadline:
+            raise _SearchTimeout()
+
+        board = state[1]
+        actor = 3 - state[0] if state[2] else state[0]
+        if board.ifPlayerWin(actor, 0):
+            return self.WIN_SCORE + depth
+        if board.ifPlayerWin(3 - actor, 0):
+            return -self.WIN_SCORE - depth
+        if depth <= 0:
+            return self._evaluate(board, actor)
+
+        key = self.game.state_key(state)
+        entry = self.tt.probe(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry.move
+            if entry.depth >= depth:
+                if entry.flag == TT_EXACT:
+                    return entry.value
+                if entry.flag == TT_LOWER:
+                    alpha = max(alpha, entry.value)
+                elif entry.flag == TT_UPPER:
+                    beta = min(beta, entry.value)
+                if alpha >= beta:
+                    return entry.value
+
+        original_alpha = alpha
+        best_value = -math.inf
+        best_move = None
+        for action in self._ordered_moves(state, depth, tt_move):
+            value = self._child_value(state, action, last_action, depth, alpha, beta)
+            if value > best_value:
+                best_value, best_move = value, action
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                if not state[2]:
+                    killers = self.killers.setdefault(depth, [])
+                    if action not in killers:
+                        killers.insert(0, action)
+                        del killers[2:]
+                    self.history[action] = self.history.get(action, 0) + depth * depth
+                break
+
+        if best_move is None:
+            return self._evaluate(board, actor)
+        if best_value <= original_alpha:
+            flag = TT_UPPER
+        elif best_value >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        self.tt.store(key, depth, best_value, flag, best_move)
+        return best_value
+
+    def _ordered_moves(
+        self, state: game.State, depth: int, tt_move: Optional[game.Action]
+    ) -> Iterator[game.Action]:
+        # staged: the transposition-table move and the killer moves are tried before the
+        # other moves are generated, which a cutoff by one of them saves entirely
+        tried = []
+        if tt_move is not None and self.game.is_legal(state, tt_move):
+            tried.append(tt_move)
+            yield tt_move
+        for killer in tuple(self.killers.get(depth, ())):
+            if killer not in tried and self.game.is_legal(state, killer):
+                tried.append(killer)
+                yield killer
+
+        # normal moves are ordered to advance the mover as far as possible; bonus moves
+        # move an opponent's piece, so they are ordered to set it back as far as possible
+        moves = [action for action in self.game.actions(state) if action not in tried]
+        board = state[1]
+        adjacent = board.geometry.adjacent
+        index = board.geometry.index
+        mover = state[0]
+        direction = 1 if mover == 1 else -1
+        if state[2]:
+            direction = -direction
+        history = self.history
+
+        def priority(action: game.Action):
+            is_hop = index[action[1]] not in adjacent[index[action[0]]]
+            return (
+                direction * (action[0][0] - action[1][0]),
+                is_hop,
+                history.get(action, 0),
+            )
+
+        moves.sort(key=priority, reverse=True)
+        yield from moves
+
+    def _evaluate(self, board, player: int) -> float:
+        score = progress_score(board)
+        return score if player == 1 else -score
+
+
+class _MctsNode(object):
+    """
+    A node of the MCTS tree. `value` is the total reward of the playouts through the
+    node, from the point of view of the player who chose the move leading to it.
+    """
+    __slots__ = ("action", "parent", "children", "untried", "visits", "value", "key", "actor")
+
+    def __init__(
+        self,
+        action: Optional[game.Action],
+        parent: Optional["_MctsNode"],
+        actor: int,
+        key: int,
+    ):
+        self.action = action
+        self.parent = parent
+        self.children: Dict[game.Action, "_MctsNode"] = {}
+        self.untried: Optional[List[game.Action]] = None
+        self.visits = 0
+        self.value = 0.0
+        self.key = key
+        self.actor = actor
+
+
+class _MctsSearch(object):
+    """
+    UCT search over ChineseChecker states, shared by MCTSAgent and its worker processes.
+    """
+
+    def __init__(
+        self,
+        ccgame: game.ChineseChecker,
+        rollout: str,
+        rollout_depth: int,
+        exploration: float,
+        rng: random.Random,
+    ):
+        self.game = ccgame
+        self.rollout_policy = rollout
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.rng = rng
+
+    @staticmethod
+    def actor(state: game.State) -> int:
+        # the player choosing the next move: a pending bonus move is chosen by the
+        # player who earned it, although it moves one of state[0]'s pieces
+        return 3 - state[0] if state[2] else state[0]
+
+    def new_root(self, state: game.State) -> _MctsNode:
+        return _MctsNode(None, None, self.actor(state), self.game.state_key(state))
+
+    def run(
+        self,
+        root: _MctsNode,
+        state: game.State,
+        last_action: Optional[game.Action],
+        deadline: Optional[float],
+        max_playouts: Optional[int],
+    ) -> int:
+        """
+        Runs playouts from state, which must be the position of root, until the deadline
+        or the playout budget is reached. Either may be None, but not both.
+
+        Returns:
+            int: The number of playouts run.
+        """
+        playouts = 0
+        while (max_playouts is None or playouts < max_playouts) and (
+            deadline is None or time.perf_counter() < deadline or playouts == 0
+        ):
+            self._playout(root, state, last_action)
+            playouts += 1
+        return playouts
+
+    def _play(self, state: game.State, action: game.Action, last_action):
+        if state[2]:
+            return self.game.opp_apply(state, action, last_action)
+        return self.game.apply(state, action)
+
+    def _playout(
+        self, root: _MctsNode, state: game.State, last_action: Optional[game.Action]
+    ) -> None:
+        tokens = []
+        node = root
+        # selection
+        while node.untried is not None and not node.untried and node.children:
+            node = self._select(node)
+            state, token = self._play(state, node.action, last_action)
+            tokens.append(token)
+            last_action = node.action
+        # expansion
+        if not self._terminal(state):
+            if node.untried is None:
+                node.untried = list(self.game.actions(state))
+                self.rng.shuffle(node.untried)
+            if node.untried:
+                action = node.untried.pop()
+                state, token = self._play(state, action, last_action)
+                tokens.append(token)
+                last_action = action
+                child = _MctsNode(action, node, self.actor(state), self.game.state_key(state))
+                node.children[action] = child
+                node = child
+        # rollout
+        reward1 = self._rollout(state, last_action, tokens)
+        for token in reversed(tokens):
+            self.game.undo(token)
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            if node.parent is not None:
+                node.value += reward1 if node.parent.actor == 1 else 1.0 - reward1
+            node = node.parent
+
+    def _select(self, node: _MctsNode) -> _MctsNode:
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        return max(
+            node.children.values(),
+            key=lambda child: child.value / child.visits
+            + exploration * math.sqrt(log_visits / child.visits),
+        )
+
+    def _terminal(self, state: game.State) -> bool:
+        return state[1].ifPlayerWin(1, 0) or state[1].ifPlayerWin(2, 0)
+
+    def _rollout(self, state: game.State, last_action, tokens: list) -> float:
+        # plays rollout_depth plies with the rollout policy, appending the undo tokens,
+        # and returns the reward of the final position for player 1
+        for _ in range(self.rollout_depth):
+            if self._terminal(state):
+                break
+            moves = self.game.actions(state)
+            if not moves:
+                break
+            if self.rollout_policy == "greedy":
+                mover = state[0]
+                sign = 1 if mover == 1 else -1
+                if state[2]:
+                    sign = -sign
+                best = max(sign * (a[0][0] - a[1][0]) for a in moves)
+                moves = [a for a in moves if sign * (a[0][0] - a[1][0]) == best]
+            action = self.rng.choice(moves)
+            state, token = self._play(state, action, last_action)
+            tokens.append(token)
+            last_action = action
+        board = state[1]
+        if board.ifPlayerWin(1, 0):
+            return 1.0
+        if board.ifPlayerWin(2, 0):
+            return 0.0
+        return 1.0 / (1.0 + math.exp(-progress_score(board) / 10.0))
+
+
+def _mcts_worker(
+    size: int,
+    piece_rows: int,
+    state: game.State,
+    last_action: Optional[game.Action],
+    rollout: str,
+    rollout_depth: int,
+    exploration: float,
+    time_limit: Optional[float],
+    max_playouts: Optional[int],
+    seed: int,
+) -> Dict[game.Action, Tuple[int, float]]:
+    """
+    Runs an independent search in a worker process for root parallelisation.
+
+    Returns:
+        dict: Visits and total value of every root move.
+    """
+    search = _MctsSearch(
+        game.ChineseChecker(size, piece_rows),
+        rollout,
+        rollout_depth,
+        exploration,
+        random.Random(seed),
+    )
+    root = search.new_root(state)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    search.run(root, state, last_action, deadline, max_playouts)
+    return {action: (child.visits, child.value) for action, child in root.children.items()}
+
+
+class MCTSAgent(Agent):
+    """
+    Agent that runs Monte Carlo Tree Search with UCT selection.
+
+    Playouts end with a short rollout (random or greedy-advance) scored by the winner or,
+    if the game is not over, by the progress heuristic. With workers > 1 the agent also
+    searches independent trees in a pool of worker processes and merges their root
+    statistics (root parallelisation). The subtree under the move played is kept and
+    reused on the next turn when the opponent's reply was searched.
+    """
+
+    def __init__(
+        self,
+        game: game.ChineseChecker,
+        time_limit: Optional[float] = 0.5,
+        simulations: Optional[int] = None,
+        rollout: str = "greedy",
+        rollout_depth: int = 8,
+        exploration: float = 1.4,
+        workers: int = 1,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initializes the agent.
+
+        Args:
+            game (ChineseChecker): The game instance.
+            time_limit (float, optional): The wall-clock budget per move in seconds, or
+                None to search for the playout budget only.
+            simulations (int, optional): The playout budget per move and process. The
+                search stops at whichever budget is reached first.
+            rollout (str): The rollout policy, "random" or "greedy".
+            rollout_depth (int): The number of plies of a rollout.
+            exploration (float): The UCT exploration constant.
+            workers (int): The number of worker processes searching in parallel.
+            seed (int, optional): The seed of the agent's random number generator.
+        """
+        super().__init__(game)
+        if rollout not in ("random", "greedy"):
+            raise Exception(f"Unknown rollout policy: {rollout}")
+        if time_limit is None and simulations is None:
+            raise Exception("MCTSAgent needs a time limit or a number of simulations")
+        self.time_limit = time_limit
+        self.simulations = simulations
+        self.workers = workers
+        self.params = {
+            "time_limit": time_limit,
+            "simulations": simulations,
+            "rollout": rollout,
+            "rollout_depth": rollout_depth,
+            "exploration": exploration,
+            "workers": workers,
+        }
+        self.rng = random.Random(seed)
+        self.search = _MctsSearch(game, rollout, rollout_depth, exploration, self.rng)
+        self._tree: Optional[_MctsNode] = None
+        self._executor = None
+        self.stats: Dict[str, float] = {}
+
+    def getAction(self, state: game.State):
+        """
+        Searches for the best move of the current player, reusing the previous tree.
+        """
+        root_state = (state[0], state[1].copy(), False)
+        root = self._reuse(root_state)
+        self.action = self._search(root, root_state, None)
+        self._tree = root.children.get(self.action)
+
+    def oppAction(self, state: game.State):
+        """
+        Searches for the best bonus move, which moves one of the opponent's pieces.
+        """
+        root_state = (state[0], state[1].copy(), True)
+        root = self.search.new_root(root_state)
+        self.opp_action = self._search(root, root_state, self.action)
+        # the tree kept by getAction assumed no bonus move was played
+        self._tree = None
+
+    def close(self) -> None:
+        """
+        Shuts down the worker processes.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _reuse(self, state: game.State) -> _MctsNode:
+        # finds the position in the subtree kept from the last move; the opponent's
+        # reply, including any bonus move, is at most two plies below
+        key = self.game.state_key(state)
+        if self._tree is not None:
+            frontier = [self._tree]
+            for _ in range(3):
+                for node in frontier:
+                    if node.key == key:
+                        node.parent = None
+                        node.action = None
+                        return node
+                frontier = [child for node in frontier for child in node.children.values()]
+        return self.search.new_root(state)
+
+    def _search(
+        self, root: _MctsNode, state: game.State, last_action: Optional[game.Action]
+    ) -> game.Action:
+        start = time.perf_counter()
+        time_limit = self.timeLimit(self.time_limit)
+        reused = root.visits
+        futures = []
+        if self.workers > 1:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(self.workers - 1)
+            futures = [
+                self._executor.submit(
+                    _mcts_worker,
+                    self.game.size,
+                    self.game.piece_rows,
+                    state,
+                    last_action,
+                    self.search.rollout_policy,
+                    self.search.rollout_depth,
+                    self.search.exploration,
+                    time_limit,
+                    self.simulations,
+                    self.rng.getrandbits(32),
+                )
+                for _ in range(self.workers - 1)
+            ]
+        deadline = None if time_limit is None else start + time_limit
+        playouts = self.search.run(root, state, last_action, deadline, self.simulations)
+
+        visits = {action: child.visits for action, child in root.children.items()}
+        total = playouts
+        for future in futures:
+            for action, (child_visits, _) in future.result().items():
+                visits[action] = visits.get(action, 0) + child_visits
+                total += child_visits
+        if not visits:
+            return random.choice(self.game.actions(state))
+        best = max(visits, key=visits.__getitem__)
+
+        elapsed = time.perf_counter() - start
+        self.stats = {
+            "playouts": total,
+            "local_playouts": playouts,
+            "reused_visits": reused,
+            "playouts_per_sec": total / elapsed if elapsed > 0 else 0.0,
+            "time": elapsed,
+        }
+        logger.info(
+            f"MCTSAgent: {total} playouts in {elapsed:.3f}s "
+            f"({self.stats['playouts_per_sec']:.0f} playouts/s, {reused} reused), "
+            f"best move visited {visits[best]} times"
+        )
+        return best
@@ -0,0 +1,328 @@
+"""
+Lockstep simulation of many games between the baseline agents, vectorized with NumPy.
+
+All boards of a batch are held in one (games, cells) array and advanced by one ply
+together: step moves come from the neighbour tables, hops from a breadth-first
+expansion of all hop frontiers of all pieces of all games at once, and the policies of
+RandomAgent and SimpleGreedyAgent pick their moves from the resulting move masks.
+
+The policies draw from a NumPy generator instead of the `random` module, so batch games
+follow the same rules and move distributions as games played by runGame, but not the
+same random sequences.
+
+Classes:
+    BatchGames: A batch of games advanced in lockstep.
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from board import Board
+from geometry import CELL_VALUES, DIRECTIONS, OFF_BOARD, get_geometry
+
+
+# agent name -> policy used for its normal move and for its bonus (opponent) move
+POLICIES = {
+    "RandomAgent": ("random", "random"),
+    "SimpleGreedyAgent": ("max_advance", "min_advance"),
+}
+
+# value of the padding cell appended to every board: not empty, and never a piece
+PAD_VALUE = 255
+
+
+class BatchGames(object):
+    """
+    A batch of games between two baseline agents, advanced one ply at a time in lockstep.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        piece_rows: int,
+        num_games: int,
+        player1: str,
+        player2: str,
+        max_iter: int = 200,
+        seed: Optional[int] = None,
+    ):
+        """
+        Sets up num_games games in their start position.
+
+        Args:
+            size (int): The size of the board.
+            piece_rows (int): The number of rows occupied by pieces at the start.
+            num_games (int): The number of games in the batch.
+            player1 (str): The agent name of player 1, a key of POLICIES.
+            player2 (str): The agent name of player 2, a key of POLICIES.
+            max_iter (int): The number of iterations after which games are stopped.
+            seed (int, optional): The seed of the generator the policies draw from.
+        """
+        for name in (player1, player2):
+            if name not in POLICIES:
+                raise Exception(f"Agent {name} is not supported by the batch engine")
+        self.size = size
+        self.piece_rows = piece_rows
+        self.num_games = num_games
+        self.policies = {1: POLICIES[player1], 2: POLICIES[player2]}
+        self.max_iter = max_iter
+        self.rng = np.random.default_rng(seed)
+
+        geometry = get_geometry(size, piece_rows)
+        self.geometry = geometry
+        cells = geometry.num_cells
+        self.cells = cells
+        # the padding cell stands in for OFF_BOARD in all tables
+        self.pad = cells
+
+        max_ray = max(len(ray) for rays in geometry.rays for ray in rays)
+        self.rays = np.full((cells + 1, len(DIRECTIONS), max_ray), self.pad, dtype=np.intp)
+        self.ray_len = np.zeros((cells + 1, len(DIRECTIONS)), dtype=np.intp)
+        for cell in range(cells):
+            for direction, ray in enumerate(geometry.rays[cell]):
+                self.rays[cell, direction, : len(ray)] = ray
+                self.ray_len[cell, direction] = len(ray)
+
+        neighbours = np.array(geometry.neighbours, dtype=np.intp).T
+        self.neighbours = np.where(neighbours == OFF_BOARD, self.pad, neighbours)
+        self.row = np.array([pos[0] for pos in geometry.positions] + [0], dtype=np.int64)
+
+        self.goal_owner = np.frombuffer(bytes(geometry.goal_owner), dtype=np.uint8)
+        self.goal_score_table = np.frombuffer(
+            bytes(geometry.goal_score_table), dtype=np.uint8
+        )
+        self.goal_filled_table = np.frombuffer(
+            bytes(geometry.goal_filled_table), dtype=np.uint8
+        )
+        self.goal_size = geometry.goal_size
+
+        # the special cells that grant a bonus move
+        self.special: Dict[int, np.ndarray] = {
+            player: np.array(geometry.special_cells[player], dtype=np.intp)
+            for player in (1, 2)
+        }
+
+        start = np.frombuffer(bytes(geometry.initial_status) + bytes([PAD_VALUE]), np.uint8)
+        self.boards = np.tile(start, (num_games, 1))
+        self.bonus_used = {
+            player: np.zeros((num_games, len(self.special[player])), dtype=bool)
+            for player in (1, 2)
+        }
+        self.iter = np.zeros(num_games, dtype=np.int64)
+        self.active = np.ones(num_games, dtype=bool)
+        self.iter_time_list: List[List[float]] = [[] for _ in range(num_games)]
+
+    def legal_moves(self, games: np.ndarray, player: int):
+        """
+        Generates the legal moves of a player on several boards at once.
+
+        Args:
+            games (np.ndarray): The indices of the games to generate moves for.
+            player (int): The player to move.
+
+        Returns:
+            tuple: (src, dest), where src[g, k] is the cell of the k-th piece of the
+                player in games[g], in cell order, and dest[g, k, cell] tells whether
+                that piece can move to cell.
+        """
+        boards = self.boards[games]
+        n = len(games)
+        mask = (boards == player) | (boards == player + 2)
+        src = np.nonzero(mask)[1].reshape(n, -1)
+        pieces = src.shape[1]
+        dest = np.zeros((n, pieces, self.cells + 1), dtype=bool)
+        game_index = np.broadcast_to(np.arange(n)[:, None], (n, pieces))
+        piece_index = np.broadcast_to(np.arange(pieces)[None, :], (n, pieces))
+
+        # steps to empty neighbours
+        neighbours = self.neighbours[src]
+        empty = boards[game_index[:, :, None], neighbours] == 0
+        step_g = np.broadcast_to(game_index[:, :, None], empty.shape)[empty]
+        step_k = np.broadcast_to(piece_index[:, :, None], empty.shape)[empty]
+        dest[step_g, step_k, neighbours[empty]] = True
+
+        # hops: breadth-first over all (game, piece) pairs at once, each piece lifted
+        reach = np.zeros_like(dest)
+        reach[game_index, piece_index, src] = True
+        frontier_g = game_index.ravel()
+        frontier_k = piece_index.ravel()
+        frontier_c = src.ravel()
+        while len(frontier_g):
+            origin = src[frontier_g, frontier_k]
+            targets = self._hop_targets(boards, frontier_g, origin, frontier_c)
+            valid = targets != self.pad
+            new_g = np.broadcast_to(frontier_g[:, None], targets.shape)[valid]
+            new_k = np.broadcast_to(frontier_k[:, None], targets.shape)[valid]
+            new_c = targets[valid]
+            fresh = ~reach[new_g, new_k, new_c]
+            flat = (new_g[fresh] * pieces + new_k[fresh]) * (self.cells + 1) + new_c[fresh]
+            flat = np.unique(flat)
+            frontier_c = flat % (self.cells + 1)
+            frontier_k = (flat // (self.cells + 1)) % pieces
+            frontier_g = flat // ((self.cells + 1) * pieces)
+            reach[frontier_g, frontier_k, frontier_c] = True
+
+        reach[game_index, piece_index, src] = False
+        dest |= reach
+        dest[:, :, self.pad] = False
+        return src, dest
+
+    def _hop_targets(
+        self, boards: np.ndarray, games: np.ndarray, origin: np.ndarray, cells: np.ndarray
+    ) -> np.ndarray:
+        # the one-hop landing cell in every direction from cells[i] on boards[games[i]],
+        # with the hopping piece lifted from origin[i]; self.pad where there is none
+        rays = self.rays[cells]
+        values = boards[games[:, None, None], rays]
+        occupied = (values != 0) & (rays != origin[:, None, None]) & (rays != self.pad)
+        has_piece = occupied.any(axis=-1)
+        hop_over = occupied.argmax(axis=-1)
+        landing = 2 * hop_over + 1
+        ok = has_piece & (landing < self.ray_len[cells])
+        landing = np.minimum(landing, rays.shape[-1] - 1)
+        # the mirror segment between the hopped piece and the landing cell must be empty
+        beyond = occupied & (np.arange(rays.shape[-1]) > hop_over[..., None])
+        ok &= ~beyond.any(axis=-1) | (beyond.argmax(axis=-1) > landing)
+        targets = np.take_along_axis(rays, landing[..., None], -1)[..., 0]
+        return np.where(ok, targets, self.pad)
+
+    def _choose(
+        self, src: np.ndarray, dest: np.ndarray, player: int, policy: str
+    ) -> tuple:
+        # picks one move per game: uniformly among all moves, or among the moves with the
+        # largest / smallest vertical advance for player
+        n = len(src)
+        if policy == "random":
+            weight = dest
+        else:
+            advance = self.row[src][:, :, None] - self.row[None, None, :]
+            if player == 2:
+                advance = -advance
+            if policy == "max_advance":
+                best = np.where(dest, advance, np.iinfo(np.int64).min).max(axis=(1, 2))
+            else:
+                best = np.where(dest, advance, np.iinfo(np.int64).max).min(axis=(1, 2))
+            weight = dest & (advance == best[:, None, None])
+        flat = weight.reshape(n, -1)
+        counts = flat.sum(axis=1)
+        pick = (self.rng.random(n) * counts).astype(np.int64)
+        index = (flat.cumsum(axis=1) > pick[:, None]).argmax(axis=1)
+        piece, dst = np.divmod(index, self.cells + 1)
+        return src[np.arange(n), piece], dst, counts > 0
+
+    def _move(self, games: np.ndarray, src: np.ndarray, dst: np.ndarray) -> None:
+        self.boards[games, dst] = self.boards[games, src]
+        self.boards[games, src] = 0
+
+    def _goal_counts(self, games: np.ndarray, table: np.ndarray) -> Dict[int, np.ndarray]:
+        values = self.boards[games, : self.cells].astype(np.intp)
+        counted = table[np.arange(self.cells) * CELL_VALUES + values]
+        return {
+            player: (counted * (self.goal_owner == player)).sum(axis=1) for player in (1, 2)
+        }
+
+    def step(self, player: int) -> None:
+        """
+        Plays one ply, including bonus moves, for player in every active game.
+
+        Args:
+            player (int): The player to move.
+        """
+        start = time.perf_counter()
+        games = np.nonzero(self.active)[0]
+        self.iter[games] += 1
+
+        src, dest = self.legal_moves(games, player)
+        move_src, move_dst, has_move = self._choose(
+            src, dest, player, self.policies[player][0]
+        )
+        games, move_src, move_dst = games[has_move], move_src[has_move], move_dst[has_move]
+        self._move(games, move_src, move_dst)
+
+        # a special piece reaching an unused special cell grants a bonus move of an
+        # opponent's piece
+        special = self.special[player]
+        on_special = move_dst[:, None] == special[None, :]
+        bonus = (
+            (self.boards[games, move_dst] == player + 2)
+            & (on_special & ~self.bonus_used[player][games]).any(axis=1)
+        )
+        if bonus.any():
+            bonus_games = games[bonus]
+            self.bonus_used[player][bonus_games] |= on_special[bonus]
+            opponent = 3 - player
+            src, dest = self.legal_moves(bonus_games, opponent)
+            opp_src, opp_dst, has_move = self._choose(
+                src, dest, opponent, self.policies[player][1]
+            )
+            self._move(bonus_games[has_move], opp_src[has_move], opp_dst[has_move])
+
+        games = np.nonzero(self.active)[0]
+        filled = self._goal_counts(games, self.goal_filled_table)
+        ended = (filled[1] == self.goal_size[1]) | (filled[2] == self.goal_size[2])
+        self.active[games[ended]] = False
+
+        elapsed = (time.perf_counter() - start) / max(len(games), 1)
+        for game in games:
+            self.iter_time_list[game].append(elapsed)
+
+    def run(self) -> List[Dict[str, Any]]:
+        """
+        Plays all games of the batch to the end.
+
+        Returns:
+            list: One record per game with the fields of runGame's Run_game_result. The
+                time of a ply is the time of the batched ply divided by its active games.
+        """
+        start = time.perf_counter()
+        iteration = 0
+        while self.active.any() and iteration < self.max_iter:
+            iteration += 1
+            self.step(1 if iteration % 2 == 1 else 2)
+        elapsed = (time.perf_counter() - start) / self.num_games
+
+        games = np.arange(self.num_games)
+        filled = self._goal_counts(games, self.goal_filled_table)
+        score = self._goal_counts(games, self.goal_score_table)
+        records = []
+        for game in games:
+            if filled[1][game] == self.goal_size[1]:
+                winner = 1
+            elif filled[2][game] == self.goal_size[2]:
+                winner = 2
+            elif score[1][game] != score[2][game]:
+                winner = 1 if score[1][game] > score[2][game] else 2
+            else:
+                winner = 0
+            records.append(
+                {
+                    "winner": winner,
+                    "iter": int(self.iter[game]),
+                    "board": self.board(game).as_formatted_string(),
+                    "time_used": elapsed,
+                    "iter_time_list": self.iter_time_list[game],
+                }
+            )
+        return records
+
+    def board(self, game: int) -> Board:
+        """
+        Returns the current position of one game as a Board.
+
+        Args:
+            game (int): The index of the game in the batch.
+
+        Returns:
+            Board: A new board holding the position.
+        """
+        board = Board(self.size, self.piece_rows, self.max_iter)
+        for cell, value in enumerate(self.boards[game, : self.cells]):
+            board.setCell(cell, int(value))
+        for player in (1, 2):
+            keys = self.geometry.special_keys[player]
+            for key, used in zip(keys, self.bonus_used[player][game]):
+                if used:
+                    board.setBonusFlag(player, key, True)
+        return board
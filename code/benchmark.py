@@ -0,0 +1,557 @@
+"""
+Micro-benchmarks for the game engine.
+
+Run from the `code` directory:
+
+    python benchmark.py hops --max-chain 16
+    python benchmark.py engine --configs 6:2 10:4 14:5 --output engine.json
+    python benchmark.py engine --baseline benchmark_baseline.json --threshold 0.1
+    python benchmark.py scaling --sizes 10 20 30 40
+
+Benchmarks:
+    hops: How multi-hop reachability (Board.getAllHopCells) scales with the length of
+        the hop chains, compared with the list-based search it replaced.
+    engine: The throughput and memory use of the engine's main operations on midgame
+        positions, for several board configurations. The positions are played by seeded
+        greedy agents, or taken from the middle of recorded replays. With a baseline
+        file, the run fails if an operation got slower by more than the threshold.
+        benchmark_baseline.json is the reference run of the default configurations.
+        Timings depend on the machine, so to check for regressions on another machine,
+        first record a baseline there from the reference commit:
+        python benchmark.py engine --output benchmark_baseline.json
+    scaling: How move generation (ChineseChecker.actions) scales with the board size, and
+        the bitset hop search against the ray scan it replaced.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agent import SimpleGreedyAgent
+from board import Board
+from game import ChineseChecker, State
+from replay import loadReplay
+
+
+def time_call(func: Callable[[], Any], min_time: float = 0.2) -> float:
+    """
+    Times a call, repeating it until at least min_time seconds have passed.
+
+    Args:
+        func (function): The call to time.
+        min_time (float): The minimum total measuring time in seconds.
+
+    Returns:
+        float: The mean time of one call in seconds.
+    """
+    func()  # warm up
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        func()
+        count += 1
+        elapsed = time.perf_counter() - start
+    return elapsed / count
+
+
+def hop_lattice_board(chain_length: int) -> Board:
+    """
+    Builds an otherwise empty board on which a piece at (2, 1) can hop down through
+    chain_length full rows of pieces, which makes the number of reachable cells grow
+    quadratically with the chain length.
+
+    Args:
+        chain_length (int): The number of rows of pieces to hop through.
+
+    Returns:
+        Board: The prepared board. The hopping cell (2, 1) is empty.
+    """
+    size = 2 * chain_length + 3
+    board = Board(size, 1)
+    for pos in board.board_status:
+        row = pos[0]
+        if 3 <= row <= 2 * chain_length + 1 and row % 2 == 1:
+            board.board_status[pos] = 1
+        else:
+            board.board_status[pos] = 0
+    return board
+
+
+def list_hop_search(board: Board, cell: int) -> List[int]:
+    """
+    The list-based search getAllHopPositions used before the visited-set search,
+    kept here as the reference the benchmark compares against.
+    """
+    result = board.oneHopCells(cell)
+    start_index = 0
+    while start_index < len(result):
+        cur_size = len(result)
+        for i in range(start_index, cur_size):
+            for new_cell in board.oneHopCells(result[i]):
+                if new_cell not in result:
+                    result.append(new_cell)
+        start_index = cur_size
+        if cell in result:
+            result.remove(cell)
+    return result
+
+
+def bench_hops(max_chain: int, min_time: float) -> List[Dict[str, Any]]:
+    """
+    Measures multi-hop search on hop lattices of growing chain length.
+
+    Args:
+        max_chain (int): The longest chain length to measure.
+        min_time (float): The minimum measuring time per call in seconds.
+
+    Returns:
+        list: One record per chain length.
+    """
+    records = []
+    for chain_length in range(1, max_chain + 1):
+        board = hop_lattice_board(chain_length)
+        cell = board.geometry.index[(2, 1)]
+        reachable = board.getAllHopCells(cell)
+        assert sorted(reachable) == sorted(list_hop_search(board, cell))
+        bfs_time = time_call(lambda: board.getAllHopCells(cell), min_time)
+        list_time = time_call(lambda: list_hop_search(board, cell), min_time)
+        records.append(
+            {
+                "chain_length": chain_length,
+                "reachable": len(reachable),
+                "bfs_us": bfs_time * 1e6,
+                "list_us": list_time * 1e6,
+                "speedup": list_time / bfs_time,
+            }
+        )
+        print(
+            f"chain {chain_length:3d}  reachable {len(reachable):5d}  "
+            f"bfs {bfs_time * 1e6:10.1f} us  list {list_time * 1e6:10.1f} us  "
+            f"x{list_time / bfs_time:.2f}"
+        )
+    return records
+
+
+def scan_one_hop_cells(board: Board, cell: int) -> List[int]:
+    """
+    The ray scan oneHopCells used before the occupancy bitset, kept here as the
+    reference the scaling benchmark compares against.
+    """
+    result = []
+    for ray in board.geometry.hop_rays[cell]:
+        target = board._rayHopTarget(board.status, ray)
+        if target != -1:
+            result.append(target)
+    return result
+
+
+def scan_hop_search(board: Board, cell: int) -> List[int]:
+    """
+    Breadth-first hop search like Board.getAllHopCells, with scan_one_hop_cells.
+    """
+    visited = {cell}
+    queue = [cell]
+    head = 0
+    while head < len(queue):
+        current = queue[head]
+        head += 1
+        for target in scan_one_hop_cells(board, current):
+            if target not in visited:
+                visited.add(target)
+                queue.append(target)
+    return queue[1:]
+
+
+def midgame_positions(
+    size: int, piece_rows: int, count: int, seed: int = 0
+) -> List[State]:
+    """
+    Plays seeded games between greedy agents up to the middle of the game.
+
+    Args:
+        size (int): The size of the board.
+        piece_rows (int): The number of rows occupied by pieces at the start.
+        count (int): The number of positions, each from its own game.
+        seed (int): The seed of the games.
+
+    Returns:
+        list: The states after 3 * size plies, with no bonus move pending.
+    """
+    ccgame = ChineseChecker(size, piece_rows)
+    agent = SimpleGreedyAgent(ccgame)
+    positions = []
+    for i in range(count):
+        random.seed(f"benchmark {seed} {size} {piece_rows} {i}")
+        state = ccgame.startState()
+        for _ in range(3 * size):
+            agent.getAction(state)
+            state = ccgame.succ(state, agent.action)
+            if state[-1]:
+                agent.oppAction(state)
+                state = ccgame.opp_apply(
+                    (state[0], state[1].copy()), agent.opp_action, agent.action
+                )[0]
+        positions.append((state[0], state[1]))
+    return positions
+
+
+def replay_positions(paths: List[str]) -> Dict[Tuple[int, int], List[State]]:
+    """
+    Takes the position in the middle of each recorded replay.
+
+    Args:
+        paths (list): Replay files, as written to the replays directory of a run.
+
+    Returns:
+        dict: (board size, piece rows) -> the positions recorded with that configuration.
+    """
+    positions: Dict[Tuple[int, int], List[State]] = {}
+    for path in paths:
+        replay = loadReplay(path)
+        ply = len(replay.moves) // 2
+        # stop on a ply where no bonus move is pending
+        while ply < len(replay.moves) and replay.moves[ply][1]:
+            ply += 1
+        state = replay.stateAt(ply)
+        positions.setdefault((replay.size, replay.piece_rows), []).append(
+            (state[0], state[1])
+        )
+    return positions
+
+
+def engine_operations(
+    ccgame: ChineseChecker, positions: List[State]
+) -> Dict[str, Tuple[Callable[[], Any], int]]:
+    """
+    Builds the engine operations to measure over a set of positions.
+
+    Args:
+        ccgame (ChineseChecker): The game of the positions' configuration.
+        positions (list): The positions to run the operations on.
+
+    Returns:
+        dict: Operation name -> (a call that runs the operation over all positions,
+        the number of operations that call performs).
+    """
+    size, piece_rows = ccgame.size, ccgame.piece_rows
+    pieces = [
+        (state, state[1].getPlayerPiecePositions(state[0])) for state in positions
+    ]
+    num_pieces = sum(len(player_pieces) for _, player_pieces in pieces)
+    # the first few legal actions of every position
+    moves = [(state, ccgame.actions(state)[:8]) for state in positions]
+    num_moves = sum(len(actions) for _, actions in moves)
+
+    def board_init():
+        for _ in positions:
+            Board(size, piece_rows)
+
+    def adjacent_positions():
+        for state, player_pieces in pieces:
+            for pos in player_pieces:
+                state[1].adjacentPositions(pos)
+
+    def all_hop_positions():
+        for state, player_pieces in pieces:
+            for pos in player_pieces:
+                state[1].getAllHopPositions(pos)
+
+    def actions():
+        for state in positions:
+            ccgame.actions(state)
+
+    def succ():
+        for state, actions in moves:
+            for action in actions:
+                ccgame.succ(state, action)
+
+    def is_end():
+        for state in positions:
+            ccgame.isEnd(state, 100)
+
+    def formatted_string():
+        for state in positions:
+            state[1].as_formatted_string()
+
+    return {
+        "Board.__init__": (board_init, len(positions)),
+        "Board.adjacentPositions": (adjacent_positions, num_pieces),
+        "Board.getAllHopPositions": (all_hop_positions, num_pieces),
+        "ChineseChecker.actions": (actions, len(positions)),
+        "ChineseChecker.succ": (succ, num_moves),
+        "ChineseChecker.isEnd": (is_end, len(positions)),
+        "Board.as_formatted_string": (formatted_string, len(positions)),
+    }
+
+
+def peak_allocation(func: Callable[[], Any]) -> int:
+    """
+    Measures the peak memory a call allocates with tracemalloc.
+
+    Args:
+        func (function): The call to measure.
+
+    Returns:
+        int: The peak size in bytes of the memory allocated during the call.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def bench_engine(
+    configs: List[Tuple[int, int]],
+    num_positions: int,
+    min_time: float,
+    replays: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Measures the engine operations on midgame positions of several board configurations.
+
+    Args:
+        configs (list): The (board size, piece rows) configurations to measure. Ignored
+            if replays are given.
+        num_positions (int): The number of generated positions per configuration.
+        min_time (float): The minimum measuring time per operation in seconds.
+        replays (list, optional): Replay files to take the positions from instead.
+
+    Returns:
+        list: One record per configuration and operation.
+    """
+    if replays:
+        positions_by_config = replay_positions(replays)
+    else:
+        positions_by_config = {
+            (size, piece_rows): midgame_positions(size, piece_rows, num_positions)
+            for size, piece_rows in configs
+        }
+    records = []
+    for (size, piece_rows), positions in sorted(positions_by_config.items()):
+        ccgame = ChineseChecker(size, piece_rows)
+        for name, (func, calls) in engine_operations(ccgame, positions).items():
+            seconds = time_call(func, min_time)
+            peak = peak_allocation(func)
+            records.append(
+                {
+                    "board_size": size,
+                    "piece_rows": piece_rows,
+                    "operation": name,
+                    "positions": len(positions),
+                    "ops_per_sec": calls / seconds,
+                    "us_per_op": seconds / calls * 1e6,
+                    "alloc_peak_bytes_per_op": peak / calls,
+                }
+            )
+            print(
+                f"{size:3d}:{piece_rows:<2d} {name:28s} {calls / seconds:12.0f} ops/s  "
+                f"{seconds / calls * 1e6:10.2f} us/op  {peak / calls:10.0f} B/op"
+            )
+    return records
+
+
+def bench_scaling(
+    sizes: List[int], piece_row_ratio: float, num_positions: int, min_time: float
+) -> List[Dict[str, Any]]:
+    """
+    Measures move generation on midgame positions of growing boards.
+
+    Args:
+        sizes (list): The board sizes to measure.
+        piece_row_ratio (float): The piece rows of a board are this fraction of its size.
+        num_positions (int): The number of positions per size.
+        min_time (float): The minimum measuring time per case in seconds.
+
+    Returns:
+        list: One record per board size.
+    """
+    records = []
+    for size in sizes:
+        piece_rows = max(1, min(size - 1, round(size * piece_row_ratio)))
+        ccgame = ChineseChecker(size, piece_rows)
+        positions = midgame_positions(size, piece_rows, num_positions)
+        pieces = [
+            (state[1], cell)
+            for state in positions
+            for cell in state[1].getPlayerPieceCells(state[0])
+        ]
+        for board, cell in pieces:
+            assert board.getAllHopCells(cell) == scan_hop_search(board, cell)
+        num_moves = sum(len(ccgame.actions(state)) for state in positions)
+
+        def actions():
+            for state in positions:
+                ccgame.actions(state)
+
+        def bitset_hops():
+            for board, cell in pieces:
+                board.getAllHopCells(cell)
+
+        def scan_hops():
+            for board, cell in pieces:
+                scan_hop_search(board, cell)
+
+        actions_time = time_call(actions, min_time) / len(positions)
+        bitset_time = time_call(bitset_hops, min_time) / len(pieces)
+        scan_time = time_call(scan_hops, min_time) / len(pieces)
+        records.append(
+            {
+                "board_size": size,
+                "piece_rows": piece_rows,
+                "cells": ccgame.board.geometry.num_cells,
+                "pieces": len(pieces) // len(positions),
+                "moves": num_moves / len(positions),
+                "actions_us": actions_time * 1e6,
+                "hop_search_bitset_us": bitset_time * 1e6,
+                "hop_search_scan_us": scan_time * 1e6,
+            }
+        )
+        print(
+            f"size {size:3d}:{piece_rows:<3d} cells {ccgame.board.geometry.num_cells:5d}  "
+            f"moves {num_moves / len(positions):7.0f}  actions {actions_time * 1e3:8.2f} ms  "
+            f"hop search {bitset_time * 1e6:8.1f} us (scan {scan_time * 1e6:8.1f} us)"
+        )
+    return records
+
+
+def compare_with_baseline(
+    records: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float
+) -> List[str]:
+    """
+    Compares engine benchmark results with a baseline run.
+
+    Args:
+        records (list): The records of this run.
+        baseline (list): The records of the baseline run.
+        threshold (float): The tolerated relative loss of ops/sec, e.g. 0.1 for 10%.
+
+    Returns:
+        list: A description of every regression. Empty if there is none.
+    """
+    reference = {
+        (r["board_size"], r["piece_rows"], r["operation"]): r for r in baseline
+    }
+    regressions = []
+    for record in records:
+        key = (record["board_size"], record["piece_rows"], record["operation"])
+        if key not in reference:
+            continue
+        ratio = record["ops_per_sec"] / reference[key]["ops_per_sec"]
+        status = "REGRESSION" if ratio < 1 - threshold else "ok"
+        print(f"{key[0]:3d}:{key[1]:<2d} {key[2]:28s} x{ratio:6.2f}  {status}")
+        if ratio < 1 - threshold:
+            regressions.append(
+                f"{key[2]} on {key[0]}:{key[1]} runs at {ratio:.2f}x the baseline"
+            )
+    return regressions
+
+
+def parser():
+    _parser = argparse.ArgumentParser(description="Chinese Checkers engine benchmarks")
+    _parser.add_argument(
+        "benchmark",
+        choices=["hops", "engine", "scaling"],
+        help="The benchmark to run.",
+    )
+    _parser.add_argument(
+        "--max-chain",
+        type=int,
+        default=12,
+        help="Longest hop chain for the 'hops' benchmark. Default is 12.",
+    )
+    _parser.add_argument(
+        "--configs",
+        type=str,
+        nargs="+",
+        default=["6:2", "10:4", "14:5"],
+        help="Board configurations as SIZE:PIECE_ROWS for the 'engine' benchmark. "
+        "Default is 6:2 10:4 14:5.",
+    )
+    _parser.add_argument(
+        "--positions",
+        type=int,
+        default=8,
+        help="Number of midgame positions per configuration for the 'engine' benchmark. "
+        "Default is 8.",
+    )
+    _parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 15, 20, 25, 30, 35, 40],
+        help="Board sizes for the 'scaling' benchmark. Default is 10 15 ... 40.",
+    )
+    _parser.add_argument(
+        "--piece-row-ratio",
+        type=float,
+        default=0.4,
+        help="Piece rows as a fraction of the board size for the 'scaling' benchmark. "
+        "Default is 0.4, as in the 10:4 board.",
+    )
+    _parser.add_argument(
+        "--replays",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Take the 'engine' positions from the middle of these replay files instead "
+        "of playing them.",
+    )
+    _parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="An earlier --output of the 'engine' benchmark to compare with, such as "
+        "the reference run benchmark_baseline.json.",
+    )
+    _parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative loss of ops/sec against the baseline that counts as a regression. "
+        "Default is 0.1.",
+    )
+    _parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="Minimum measuring time per case in seconds. Default is 0.2.",
+    )
+    _parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write the results as JSON to this file.",
+    )
+    return _parser
+
+
+if __name__ == "__main__":
+    args = parser().parse_args()
+    if args.benchmark == "hops":
+        results = bench_hops(args.max_chain, args.min_time)
+    elif args.benchmark == "engine":
+        configs = [tuple(int(x) for x in config.split(":")) for config in args.configs]
+        results = bench_engine(configs, args.positions, args.min_time, args.replays)
+    elif args.benchmark == "scaling":
+        results = bench_scaling(
+            args.sizes, args.piece_row_ratio, args.positions, args.min_time
+        )
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": args.benchmark, "results": results}, f, indent=4)
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
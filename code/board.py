@@ -1,11 +1,96 @@
-from typing import List, Optional, Tuple, Dict, Callable
+from collections.abc import MutableMapping
+from typing import Iterator, List, Optional, Set, Tuple, Dict, Callable
+
+from geometry import (
+    BoardGeometry,
+    get_geometry,
+    LEFT,
+    RIGHT,
+    UP_LEFT,
+    UP_RIGHT,
+    DOWN_LEFT,
+    DOWN_RIGHT,
+    OFF_BOARD,
+    CELL_VALUES,
+    OWNER,
+)
+
+
+class BoardStatusView(MutableMapping):
+    """
+    A dict-like view of a Board keyed by (row, col) tuples.
+
+    It keeps code that reads or writes `board.board_status[(row, col)]` working on top
+    of the flat cell array. Cells can be read and overwritten, but not added or removed.
+    """
+
+    def __init__(self, board: "Board"):
+        self._board = board
+        self._index = board.geometry.index
+
+    def __getitem__(self, pos: Tuple[int, int]) -> int:
+        return self._board.status[self._index[pos]]
+
+    def __setitem__(self, pos: Tuple[int, int], value: int) -> None:
+        self._board.setCell(self._index[pos], value)
+
+    def __delitem__(self, pos: Tuple[int, int]) -> None:
+        raise TypeError("cells cannot be removed from a board")
+
+    def __contains__(self, pos: object) -> bool:
+        return pos in self._index
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(self._board.geometry.positions)
+
+    def __len__(self) -> int:
+        return len(self._board.status)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+    def __deepcopy__(self, memo) -> "BoardStatusView":
+        # the view of a copy of the board, so that reads and writes stay on the same cells;
+        # a board copied along with the view is reused
+        board = memo.get(id(self._board))
+        if board is None:
+            board = self._board.__deepcopy__(memo)
+        return board.board_status
+
+    def copy(self) -> Dict[Tuple[int, int], int]:
+        """
+        Returns a snapshot of the cells as a plain dict, like dict.copy.
+
+        Returns:
+            dict: (row, col) -> cell value.
+        """
+        return dict(self.items())
 
 
 class Board(object):
     """
     Board class represents a game board for a two-player game.
+
+    The cells are stored in a flat bytearray `status`, indexed through the shared
+    BoardGeometry. `board_status` is a (row, col)-keyed view of the same cells.
+
+    `zobrist` is the Zobrist hash of the cells and the used bonus-move flags,
+    `pieces[player]` is the set of cells holding that player's pieces, and
+    `goal_score[player]` / `goal_filled[player]` count the pieces in that player's goal
+    region for the timeout tie-break and the win test. All of them are kept up to date
+    by every method that changes the board, so `status` itself should only be written
+    through them.
     """
 
+    _direction_by_name = {
+        "leftPosition": LEFT,
+        "rightPosition": RIGHT,
+        "upLeftPosition": UP_LEFT,
+        "upRightPosition": UP_RIGHT,
+        "downLeftPosition": DOWN_LEFT,
+        "downRightPosition": DOWN_RIGHT,
+    }
+
     def __init__(self, size: int, piece_rows: int, max_iter: int = 200):
         """
         Initializes the board with the given size, piece rows, and maximum iterations.
@@ -17,32 +102,55 @@ class Board(object):
         """
         assert piece_rows < size
 
-        self.player1_pos = {"(2, 1)": False, "(2, 2)": False}
-        self.player2_pos = {"(18, 1)": False, "(18, 2)": False}
-
         self.size = size
         self.piece_rows = piece_rows
         self.max_iter = max_iter
-        self.board_status: Dict[Tuple[int, int], int] = {}
-        for row in range(1, size + 1):
-            for col in range(1, self.getColNum(row) + 1):
-                if row <= piece_rows:
-                    self.board_status[(row, col)] = 2
-                else:
-                    self.board_status[(row, col)] = 0
+        self.geometry: BoardGeometry = get_geometry(size, piece_rows)
+        # special cell, e.g. "(2, 1)" -> whether its bonus move has been used
+        self.player1_pos = dict.fromkeys(self.geometry.special_keys[1], False)
+        self.player2_pos = dict.fromkeys(self.geometry.special_keys[2], False)
+        self.status = bytearray(self.geometry.initial_status)
+        # bitset of the occupied cells, bit i standing for cell i, kept in sync with status
+        self.occupied = self.geometry.initial_occupied
+        self.zobrist = self.geometry.initial_hash
+        self.pieces: List[Set[int]] = [set(cells) for cells in self.geometry.initial_pieces]
+        self.goal_score = list(self.geometry.initial_goal_score)
+        self.goal_filled = list(self.geometry.initial_goal_filled)
+        self.board_status = BoardStatusView(self)
+
+    def __deepcopy__(self, memo) -> "Board":
+        new = Board.__new__(Board)
+        new.__dict__.update(self.__dict__)
+        new.player1_pos = dict(self.player1_pos)
+        new.player2_pos = dict(self.player2_pos)
+        new.status = bytearray(self.status)
+        new.pieces = [set(cells) for cells in self.pieces]
+        new.goal_score = list(self.goal_score)
+        new.goal_filled = list(self.goal_filled)
+        new.board_status = BoardStatusView(new)
+        memo[id(self)] = new
+        return new
+
+    def copy(self) -> "Board":
+        """
+        Returns an independent copy of the board that shares the same geometry.
 
-        self.board_status[(2, 1)] = 4
-        self.board_status[(2, 2)] = 4
+        Returns:
+            Board: The copied board.
+        """
+        return self.__deepcopy__({})
 
-        for row in range(size + 1, size * 2):
-            for col in range(1, self.getColNum(row) + 1):
-                if row < size * 2 - piece_rows:
-                    self.board_status[(row, col)] = 0
-                else:
-                    self.board_status[(row, col)] = 1
+    def __getstate__(self):
+        # the geometry is shared and cheap to look up again, so it is not pickled
+        state = self.__dict__.copy()
+        del state["geometry"]
+        del state["board_status"]
+        return state
 
-        self.board_status[(size * 2 - 2, 1)] = 3
-        self.board_status[(size * 2 - 2, 2)] = 3
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.geometry = get_geometry(self.size, self.piece_rows)
+        self.board_status = BoardStatusView(self)
 
     def getColNum(self, row: int) -> int:
         """
@@ -54,10 +162,7 @@ class Board(object):
         Returns:
             int: The number of columns in the given row.
         """
-        if 1 <= row <= self.size:
-            return row
-        else:
-            return self.size * 2 - row
+        return self.geometry.getColNum(row)
 
     def isEmptyPosition(self, pos: Tuple[int, int]) -> bool:
         """
@@ -69,7 +174,14 @@ class Board(object):
         Returns:
             bool: True if the position is empty, False otherwise.
         """
-        return self.board_status[pos] == 0
+        return self.status[self.geometry.index[pos]] == 0
+
+    def _neighbourPosition(
+        self, pos: Tuple[int, int], direction: int
+    ) -> Optional[Tuple[int, int]]:
+        cell = self.geometry.neighbours[direction][self.geometry.index[pos]]
+        if cell != OFF_BOARD:
+            return self.geometry.positions[cell]
 
     def leftPosition(self, pos: Tuple[int, int]) -> Optional[Tuple[int, int]]:
         """
@@ -81,10 +193,7 @@ class Board(object):
         Returns:
             tuple: The position to the left.
         """
-        row = pos[0]
-        col = pos[1]
-        if (row, col - 1) in self.board_status.keys():
-            return (row, col - 1)
+        return self._neighbourPosition(pos, LEFT)
 
     def rightPosition(self, pos: Tuple[int, int]) -> Optional[Tuple[int, int]]:
         """
@@ -96,10 +205,7 @@ class Board(object):
         Returns:
             tuple: The position to the right.
         """
-        row = pos[0]
-        col = pos[1]
-        if (row, col + 1) in self.board_status.keys():
-            return (row, col + 1)
+        return self._neighbourPosition(pos, RIGHT)
 
     def upLeftPosition(self, pos: Tuple[int, int]) -> Optional[Tuple[int, int]]:
         """
@@ -111,12 +217,7 @@ class Board(object):
         Returns:
             tuple: The position to the upper left.
         """
-        row = pos[0]
-        col = pos[1]
-        if row <= self.size and (row - 1, col - 1) in self.board_status.keys():
-            return (row - 1, col - 1)
-        if row > self.size and (row - 1, col) in self.board_status.keys():
-            return (row - 1, col)
+        return self._neighbourPosition(pos, UP_LEFT)
 
     def upRightPosition(self, pos: Tuple[int, int]) -> Optional[Tuple[int, int]]:
         """
@@ -128,12 +229,7 @@ class Board(object):
         Returns:
             tuple: The position to the upper right.
         """
-        row = pos[0]
-        col = pos[1]
-        if row <= self.size and (row - 1, col) in self.board_status.keys():
-            return (row - 1, col)
-        if row > self.size and (row - 1, col + 1) in self.board_status.keys():
-            return (row - 1, col + 1)
+        return self._neighbourPosition(pos, UP_RIGHT)
 
     def downLeftPosition(self, pos: Tuple[int, int]) -> Optional[Tuple[int, int]]:
         """
@@ -145,12 +241,7 @@ class Board(object):
         Returns:
             tuple: The position to the lower left.
         """
-        row = pos[0]
-        col = pos[1]
-        if row < self.size and (row + 1, col) in self.board_status.keys():
-            return (row + 1, col)
-        if row >= self.size and (row + 1, col - 1) in self.board_status.keys():
-            return (row + 1, col - 1)
+        return self._neighbourPosition(pos, DOWN_LEFT)
 
     def downRightPosition(self, pos: Tuple[int, int]) -> Optional[Tuple[int, int]]:
         """
@@ -162,12 +253,7 @@ class Board(object):
         Returns:
             tuple: The position to the lower right.
         """
-        row = pos[0]
-        col = pos[1]
-        if row < self.size and (row + 1, col + 1) in self.board_status.keys():
-            return (row + 1, col + 1)
-        if row >= self.size and (row + 1, col) in self.board_status.keys():
-            return (row + 1, col)
+        return self._neighbourPosition(pos, DOWN_RIGHT)
 
     def adjacentPositions(self, pos: Tuple[int, int]) -> List[Tuple[int, int]]:
         """
@@ -179,14 +265,8 @@ class Board(object):
         Returns:
             list: A list of adjacent positions.
         """
-        result: List[Optional[Tuple[int, int]]] = []
-        result.append(self.leftPosition(pos))
-        result.append(self.rightPosition(pos))
-        result.append(self.upLeftPosition(pos))
-        result.append(self.upRightPosition(pos))
-        result.append(self.downLeftPosition(pos))
-        result.append(self.downRightPosition(pos))
-        return [x for x in result if x is not None]
+        positions = self.geometry.positions
+        return [positions[cell] for cell in self.geometry.adjacent[self.geometry.index[pos]]]
 
     def getPlayerPiecePositions(self, player: int) -> List[Tuple[int, int]]:
         """
@@ -198,11 +278,137 @@ class Board(object):
         Returns:
             list: A list of positions occupied by the player's pieces.
         """
-        return [
-            pos
-            for pos, piece in self.board_status.items()
-            if piece == player or piece == player + 2
-        ]
+        positions = self.geometry.positions
+        return [positions[cell] for cell in self.getPlayerPieceCells(player)]
+
+    def movePiece(self, src: int, dst: int) -> int:
+        """
+        Moves the piece on one cell to another cell.
+
+        Args:
+            src (int): The cell index the piece moves from.
+            dst (int): The cell index the piece moves to.
+
+        Returns:
+            int: The value that was overwritten at dst, which is 0 for a legal move.
+        """
+        status = self.status
+        keys = self.geometry.zobrist
+        piece = status[src]
+        captured = status[dst]
+        self.zobrist ^= (
+            keys[src * CELL_VALUES + piece]
+            ^ keys[dst * CELL_VALUES + captured]
+            ^ keys[dst * CELL_VALUES + piece]
+        )
+        status[dst] = piece
+        status[src] = 0
+        if piece:
+            self.occupied ^= 1 << src if captured else (1 << src) | (1 << dst)
+        elif captured:
+            self.occupied ^= 1 << dst
+        if captured:
+            self.pieces[OWNER[captured]].discard(dst)
+        if piece:
+            cells = self.pieces[OWNER[piece]]
+            cells.discard(src)
+            cells.add(dst)
+        goal_owner = self.geometry.goal_owner
+        if goal_owner[src]:
+            self._updateGoal(src, piece, 0)
+        if goal_owner[dst]:
+            self._updateGoal(dst, captured, piece)
+        return captured
+
+    def unmovePiece(self, src: int, dst: int, captured: int = 0) -> None:
+        """
+        Takes back a movePiece(src, dst) call.
+
+        Args:
+            src (int): The cell index the piece moved from.
+            dst (int): The cell index the piece moved to.
+            captured (int): The value movePiece returned.
+        """
+        status = self.status
+        keys = self.geometry.zobrist
+        piece = status[dst]
+        self.zobrist ^= (
+            keys[dst * CELL_VALUES + piece]
+            ^ keys[dst * CELL_VALUES + captured]
+            ^ keys[src * CELL_VALUES + piece]
+        )
+        status[src] = piece
+        status[dst] = captured
+        if piece:
+            self.occupied ^= 1 << src if captured else (1 << src) | (1 << dst)
+        elif captured:
+            self.occupied ^= 1 << dst
+        if piece:
+            cells = self.pieces[OWNER[piece]]
+            cells.discard(dst)
+            cells.add(src)
+        if captured:
+            self.pieces[OWNER[captured]].add(dst)
+        goal_owner = self.geometry.goal_owner
+        if goal_owner[dst]:
+            self._updateGoal(dst, piece, captured)
+        if goal_owner[src]:
+            self._updateGoal(src, 0, piece)
+
+    def setCell(self, cell: int, value: int) -> None:
+        """
+        Sets the value of one cell.
+
+        Args:
+            cell (int): The cell index.
+            value (int): The new value (0 for empty, 1-4 for pieces).
+        """
+        keys = self.geometry.zobrist
+        old = self.status[cell]
+        self.zobrist ^= keys[cell * CELL_VALUES + old] ^ keys[cell * CELL_VALUES + value]
+        if old:
+            self.pieces[OWNER[old]].discard(cell)
+        if value:
+            self.pieces[OWNER[value]].add(cell)
+        if bool(old) != bool(value):
+            self.occupied ^= 1 << cell
+        if self.geometry.goal_owner[cell]:
+            self._updateGoal(cell, old, value)
+        self.status[cell] = value
+
+    def _updateGoal(self, cell: int, old: int, new: int) -> None:
+        # cell lies in a goal region and its value changes from old to new
+        geometry = self.geometry
+        player = geometry.goal_owner[cell]
+        base = cell * CELL_VALUES
+        self.goal_score[player] += (
+            geometry.goal_score_table[base + new] - geometry.goal_score_table[base + old]
+        )
+        self.goal_filled[player] += (
+            geometry.goal_filled_table[base + new] - geometry.goal_filled_table[base + old]
+        )
+
+    def setBonusFlag(self, player: int, key: str, value: Optional[bool]) -> Optional[bool]:
+        """
+        Sets whether the bonus move of a special cell has been used.
+
+        Args:
+            player (int): The player owning the special cell (1 or 2).
+            key (str): The special cell formatted as a string, e.g. "(2, 1)".
+            value (bool): The new flag value, or None to remove the flag.
+
+        Returns:
+            bool: The previous flag value, or None if the flag did not exist.
+        """
+        flags = self.player1_pos if player == 1 else self.player2_pos
+        previous = flags.get(key)
+        if bool(previous) != bool(value):
+            self.zobrist ^= self.geometry.zobristFlag(player, key)
+        if value is None:
+            flags.pop(key, None)
+        else:
+            flags[key] = value
+        return previous
 
     def getOneDirectionHopPosition(
         self,
@@ -212,13 +418,31 @@ class Board(object):
         """
         Returns the possible target hop position in the direction designated by dir_func.
 
+        The six *Position methods of this board are resolved with the precomputed hop rays.
+        Any other direction function is followed step by step.
+
         Args:
             pos (tuple): The current position.
-            dir_func (function): The direction function.
+            dir_func (function): The direction function, mapping a position to the next
+                one in its direction, or to None off the board.
 
         Returns:
             tuple: The target hop position.
         """
+        name = getattr(dir_func, "__name__", None)
+        direction = self._direction_by_name.get(name)
+        if (
+            direction is not None
+            and getattr(dir_func, "__self__", None) is self
+            and getattr(dir_func, "__func__", None) is getattr(Board, name)
+        ):
+            target = self.hopTarget(self.geometry.index[pos], direction)
+            if target != OFF_BOARD:
+                return self.geometry.positions[target]
+            return None
+
+        # the piece hopped over must be as far from the landing cell as from pos, with
+        # only empty cells in between
         hop_over_pos = dir_func(pos)
         count = 0
         while hop_over_pos is not None:
@@ -239,6 +463,87 @@ class Board(object):
                 and self.board_status[target_position] == 0
             ):
                 return target_position
+        return None
+
+    def hopTarget(self, cell: int, direction: int) -> int:
+        """
+        Returns the cell reached by hopping from the given cell in one direction.
+
+        A piece may hop over exactly one piece that lies any distance away along a line,
+        provided the cells on both sides of the hopped piece are empty and the landing
+        cell mirrors the starting cell.
+
+        Args:
+            cell (int): The cell index of the hopping piece.
+            direction (int): One of the direction constants of the geometry module.
+
+        Returns:
+            int: The cell index of the landing cell, or OFF_BOARD if there is none.
+        """
+        return self._rayHopTarget(self.status, self.geometry.rays[cell][direction])
+
+    @staticmethod
+    def _rayHopTarget(status: bytearray, ray: Tuple[int, ...]) -> int:
+        # the first piece on the ray is hopped over, and the landing cell mirrors the
+        # starting cell, so every cell between the hopped piece and it must be empty
+        for k, hop_over in enumerate(ray):
+            if status[hop_over] != 0:
+                break
+        else:
+            return OFF_BOARD
+        landing = 2 * k + 1
+        if landing >= len(ray):
+            return OFF_BOARD
+        for i in range(k + 1, landing + 1):
+            if status[ray[i]] != 0:
+                return OFF_BOARD
+        return ray[landing]
+
+    def oneHopCells(self, cell: int) -> List[int]:
+        """
+        Returns the cells that can be reached from the given cell in one hop.
+
+        All six directions are resolved in one pass over the precomputed hop rays. The
+        pieces on a ray are found by intersecting it with the occupancy bitset, so the
+        cost does not grow with the length of the empty stretches of the ray.
+
+        Args:
+            cell (int): The cell index of the hopping piece.
+
+        Returns:
+            list: The cell indices of the landing cells, in direction order.
+        """
+        occupied = self.occupied
+        row_of = self.geometry.row_of
+        result = []
+        for ray, mask, ascending, horizontal in self.geometry.hop_ray_masks[cell]:
+            blockers = occupied & mask
+            if not blockers:
+                continue
+            # the first piece on the ray is hopped over
+            if ascending:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            if horizontal:
+                k = abs(first - cell) - 1
+            else:
+                k = abs(row_of[first] - row_of[cell]) - 1
+            landing = 2 * k + 1
+            if landing >= len(ray):
+                continue
+            target = ray[landing]
+            # the landing cell mirrors the starting cell, so the next piece on the ray
+            # must lie beyond it
+            rest = blockers ^ (1 << first)
+            if rest:
+                if ascending:
+                    if (rest & -rest).bit_length() - 1 <= target:
+                        continue
+                elif rest.bit_length() - 1 >= target:
+                    continue
+            result.append(target)
+        return result
 
     def getOneHopPositions(self, pos: Tuple[int, int]) -> List[Tuple[int, int]]:
         """
@@ -250,14 +555,67 @@ class Board(object):
         Returns:
             list: A list of positions that can be reached in one hop.
         """
-        result: List[Optional[Tuple[int, int]]] = []
-        result.append(self.getOneDirectionHopPosition(pos, self.leftPosition))
-        result.append(self.getOneDirectionHopPosition(pos, self.rightPosition))
-        result.append(self.getOneDirectionHopPosition(pos, self.upLeftPosition))
-        result.append(self.getOneDirectionHopPosition(pos, self.upRightPosition))
-        result.append(self.getOneDirectionHopPosition(pos, self.downLeftPosition))
-        result.append(self.getOneDirectionHopPosition(pos, self.downRightPosition))
-        return [x for x in result if x is not None]
+        positions = self.geometry.positions
+        return [positions[cell] for cell in self.oneHopCells(self.geometry.index[pos])]
+
+    def getAllHopCells(
+        self, cell: int, parents: Optional[Dict[int, int]] = None
+    ) -> List[int]:
+        """
+        Returns all cells that can be reached from the given cell in one or more hops.
+
+        The hop graph is searched breadth-first with a visited set, so every reachable
+        cell is expanded exactly once.
+
+        Args:
+            cell (int): The cell index of the hopping piece.
+            parents (dict, optional): If given, it is filled with the cell each reachable
+                cell was first hopped from, which is enough to rebuild every hop chain.
+
+        Returns:
+            list: The reachable cell indices in breadth-first order, without the start cell.
+        """
+        visited = {cell}
+        queue = [cell]
+        head = 0
+        while head < len(queue):
+            current = queue[head]
+            head += 1
+            for target in self.oneHopCells(current):
+                if target not in visited:
+                    visited.add(target)
+                    queue.append(target)
+                    if parents is not None:
+                        parents[target] = current
+        return queue[1:]
+
+    def canHopTo(self, cell: int, target: int) -> bool:
+        """
+        Checks whether a piece can reach a cell in one or more hops.
+
+        The hop graph is searched breadth-first like getAllHopCells, but the search
+        stops as soon as the target is reached.
+
+        Args:
+            cell (int): The cell index of the hopping piece.
+            target (int): The cell index to reach.
+
+        Returns:
+            bool: True if the target is reachable, False otherwise.
+        """
+        visited = {cell}
+        queue = [cell]
+        head = 0
+        while head < len(queue):
+            current = queue[head]
+            head += 1
+            for landing in self.oneHopCells(current):
+                if landing == target:
+                    return True
+                if landing not in visited:
+                    visited.add(landing)
+                    queue.append(landing)
+        return False
 
     def getAllHopPositions(self, pos: Tuple[int, int]) -> List[Tuple[int, int]]:
         """
@@ -269,18 +627,44 @@ class Board(object):
         Returns:
             list: A list of positions that can be reached in several hops.
         """
-        result = self.getOneHopPositions(pos)
-        start_index = 0
-        while start_index < len(result):
-            cur_size = len(result)
-            for i in range(start_index, cur_size):
-                for new_pos in self.getOneHopPositions(result[i]):
-                    if new_pos not in result:
-                        result.append(new_pos)
-            start_index = cur_size
-            if pos in result:
-                result.remove(pos)
-        return result
+        positions = self.geometry.positions
+        return [positions[cell] for cell in self.getAllHopCells(self.geometry.index[pos])]
+
+    def getAllHopPaths(
+        self, pos: Tuple[int, int]
+    ) -> Dict[Tuple[int, int], List[Tuple[int, int]]]:
+        """
+        Returns the hop chain leading to every position reachable from the given position.
+
+        Args:
+            pos (tuple): The current position.
+
+        Returns:
+            dict: Maps each reachable position to the list of positions visited on the way
+                there, starting with pos and ending with the reachable position.
+        """
+        positions = self.geometry.positions
+        start = self.geometry.index[pos]
+        parents: Dict[int, int] = {}
+        paths: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for cell in self.getAllHopCells(start, parents):
+            chain = [cell]
+            while chain[-1] != start:
+                chain.append(parents[chain[-1]])
+            paths[positions[cell]] = [positions[c] for c in reversed(chain)]
+        return paths
+
+    def getPlayerPieceCells(self, player: int) -> List[int]:
+        """
+        Returns the cell indices occupied by the given player's pieces, in cell order.
+
+        Args:
+            player (int): The player number (1 or 2).
+
+        Returns:
+            list: The cell indices occupied by the player's pieces.
+        """
+        return sorted(self.pieces[player])
 
     def compare_piece_num(self):
         """
@@ -289,24 +673,8 @@ class Board(object):
         Returns:
             int: The player number with more pieces (1 or 2).
         """
-        player1_score = 0
-        player2_score = 0
-
-        for row in range(1, self.piece_rows + 1):
-            for col in range(1, self.getColNum(row) + 1):
-                if (
-                    self.board_status[(row, col)] == 3
-                    or self.board_status[(row, col)] == 1
-                ):
-                    player1_score += 1
-
-        for row in range(self.size * 2 - self.piece_rows, self.size * 2):
-            for col in range(1, self.getColNum(row) + 1):
-                if (
-                    self.board_status[(row, col)] == 4
-                    or self.board_status[(row, col)] == 2
-                ):
-                    player2_score += 1
+        player1_score = self.goal_score[1]
+        player2_score = self.goal_score[2]
 
         if player1_score > player2_score:
             return 1
@@ -326,34 +694,12 @@ class Board(object):
         Returns:
             bool: True if the player has won, False otherwise.
         """
-        if player == 1:
-            for row in range(1, self.piece_rows + 1):
-                for col in range(1, self.getColNum(row) + 1):
-                    if row == 2 and self.board_status[(row, col)] == 3:
-                        continue
-                    elif self.board_status[(row, col)] == 1:
-                        continue
-                    elif iter > self.max_iter:
-                        return self.compare_piece_num() == 1
-                    else:
-                        return False
+        if self.goal_filled[player] == self.geometry.goal_size[player]:
             return True
-
+        elif iter > self.max_iter:
+            return self.compare_piece_num() == (1 if player == 1 else -1)
         else:
-            for row in range(self.size * 2 - self.piece_rows, self.size * 2):
-                for col in range(1, self.getColNum(row) + 1):
-                    if (
-                        row == self.size * 2 - self.piece_rows + 2
-                        and self.board_status[(row, col)] == 4
-                    ):
-                        continue
-                    elif self.board_status[(row, col)] == 2:
-                        continue
-                    elif iter > self.max_iter:
-                        return self.compare_piece_num() == -1
-                    else:
-                        return False
-            return True
+            return False
 
     def isEnd(self, iter: int) -> Tuple[bool, Optional[int]]:
         """
@@ -381,22 +727,16 @@ class Board(object):
         Returns:
             str: The formatted string representing the board state.
         """
-        symbol_lut = {0: ".", 1: "1", 2: "2", 3: "3", 4: "4"}
-
-        result = ""
-        for row in range(1, self.size + 1):
-            result += " " * (self.size - row)
-            for col in range(1, self.getColNum(row) + 1):
-                result += symbol_lut[self.board_status[(row, col)]] + " "
-            result += "\n"
+        symbol_lut = ".1234"
+        status = self.status
+        rows = self.geometry.rows
 
-        for row in range(self.size + 1, self.size * 2):
-            result += " " * (row - self.size)
-            for col in range(1, self.getColNum(row) + 1):
-                result += symbol_lut[self.board_status[(row, col)]] + " "
-            result += "\n"
+        lines = []
+        for row in range(1, self.size * 2):
+            indent = " " * abs(self.size - row)
+            lines.append(indent + " ".join(symbol_lut[status[cell]] for cell in rows[row]))
 
-        return "\n".join(map(lambda s: s.rstrip(), result.split("\n"))).rstrip("\n")
+        return "\n".join(lines)
 
     def printBoard(self):
         """
@@ -1,10 +1,21 @@
-import copy
-from typing import List, Tuple
+from collections import namedtuple
+from typing import FrozenSet, Iterator, List, Optional, Tuple
 
 from board import Board
+from geometry import OWNER
 
 
 State = Tuple[int, Board] | Tuple[int, Board, bool]
+Action = Tuple[Tuple[int, int], Tuple[int, int]]
+
+# Everything ChineseChecker.undo needs to take back one apply or opp_apply:
+# the state before the move, the moved cells, the value that was overwritten at the
+# destination, and the bonus-move flag that was set (flag_key is None for apply).
+Undo_token = namedtuple(
+    "Undo_token",
+    ["state", "src", "dst", "captured", "flag_player", "flag_key", "flag_value"],
+    defaults=[None, None, None],
+)
 
 
 class ChineseChecker(object):
@@ -20,6 +31,13 @@ class ChineseChecker(object):
         self.size = size
         self.piece_rows = piece_rows
         self.board = Board(self.size, self.piece_rows)
+        # state_key and actions of the state that was enumerated last, and the set of
+        # those actions once is_legal has needed it
+        self._actions_cache: Tuple[int, List[Action], Optional[FrozenSet[Action]]] = (
+            0,
+            [],
+            None,
+        )
 
     def startState(self) -> State:
         """
@@ -52,24 +70,11 @@ class ChineseChecker(object):
             state (tuple): The current state of the game.
 
         Returns:
-            list: A list of possible actions.
+            list: A list of possible actions. It is kept for is_legal, so copy it before
+                modifying it.
         """
-        action_list: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
-        player = state[0]
-        board = state[1]
-        player_piece_pos_list = board.getPlayerPiecePositions(player)
-        for pos in player_piece_pos_list:
-            for adj_pos in board.adjacentPositions(pos):
-                if board.isEmptyPosition(adj_pos):
-                    action_list.append((pos, adj_pos))
-
-        for pos in player_piece_pos_list:
-            boardCopy = copy.deepcopy(board)
-            boardCopy.board_status[pos] = 0
-            for new_pos in boardCopy.getAllHopPositions(pos):
-                if (pos, new_pos) not in action_list:
-                    action_list.append((pos, new_pos))
-
+        action_list = self._legal_actions(state[0], state[1])
+        self._actions_cache = (self.state_key(state), action_list, None)
         return action_list
 
     def opp_actions(
@@ -82,25 +87,195 @@ class ChineseChecker(object):
             state (tuple): The current state of the game.
 
         Returns:
-            list: A list of possible actions for the opponent.
+            list: A list of possible actions for the opponent. It is kept for is_legal, so
+                copy it before modifying it.
+        """
+        action_list = self._legal_actions(state[0], state[1])
+        self._actions_cache = (self.state_key(state), action_list, None)
+        return action_list
+
+    def is_legal(self, state: State, action: Action) -> bool:
+        """
+        Checks whether an action is one of actions(state), or of opp_actions(state) when
+        a bonus move is pending, without generating them all.
+
+        If the state is the one whose actions were generated last, for example by the
+        agent that chose the action, the answer comes from those actions. Otherwise a
+        step is checked against the neighbours of the piece, and a hop by a search from
+        the moved piece only, which stops when it reaches the destination.
+
+        Args:
+            state (tuple): The state the action is played in.
+            action (tuple): The action to check.
+
+        Returns:
+            bool: True if the action is legal, False otherwise.
+        """
+        board = state[1]
+        index = board.geometry.index
+        try:
+            if type(action) is not tuple or len(action) != 2:
+                return False
+            src = index[action[0]]
+            dst = index[action[1]]
+        except (KeyError, TypeError):
+            return False
+
+        key, cached_actions, cached_set = self._actions_cache
+        if key == self.state_key(state):
+            if cached_set is None:
+                cached_set = frozenset(cached_actions)
+                self._actions_cache = (key, cached_actions, cached_set)
+            return action in cached_set
+
+        status = board.status
+        piece = status[src]
+        if piece == 0 or OWNER[piece] != state[0] or status[dst] != 0 or src == dst:
+            return False
+        if dst in board.geometry.adjacent[src]:
+            return True
+        status[src] = 0
+        board.occupied ^= 1 << src
+        try:
+            return board.canHopTo(src, dst)
+        finally:
+            status[src] = piece
+            board.occupied ^= 1 << src
+
+    def _legal_actions(
+        self, player: int, board: Board
+    ) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+        """
+        Generates the legal actions of a player: all steps first, then all hops.
+
+        The moving piece is lifted off the board in place while its hops are searched,
+        instead of searching on a copy of the board.
+
+        Args:
+            player (int): The player to move.
+            board (Board): The board to generate actions on. It is left unchanged.
+
+        Returns:
+            list: A list of possible actions.
         """
         action_list: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
+        status = board.status
+        positions = board.geometry.positions
+        adjacent = board.geometry.adjacent
+        piece_cells = board.getPlayerPieceCells(player)
+        for cell in piece_cells:
+            for adj_cell in adjacent[cell]:
+                if status[adj_cell] == 0:
+                    action_list.append((positions[cell], positions[adj_cell]))
+
+        for cell in piece_cells:
+            for new_cell in self._hop_cells(board, cell):
+                action_list.append((positions[cell], positions[new_cell]))
+
+        return action_list
+
+    @staticmethod
+    def _hop_cells(board: Board, cell: int) -> List[int]:
+        """
+        Searches the hops of the piece on a cell, with the piece lifted off the board in
+        place. Hops that end next to the cell are left out, since they are also steps.
+
+        Args:
+            board (Board): The board the piece is on. It is left unchanged.
+            cell (int): The cell index of the piece.
+
+        Returns:
+            list: The cell indices the piece can hop to, in breadth-first order.
+        """
+        status = board.status
+        piece = status[cell]
+        status[cell] = 0
+        board.occupied ^= 1 << cell
+        try:
+            hop_cells = board.getAllHopCells(cell)
+        finally:
+            status[cell] = piece
+            board.occupied ^= 1 << cell
+        adjacent = board.geometry.adjacent[cell]
+        return [new_cell for new_cell in hop_cells if new_cell not in adjacent]
+
+    def iter_actions(self, state: State, order: str = "advance") -> Iterator[Action]:
+        """
+        Yields the same actions as actions(state), lazily and in the given order, so that
+        a consumer that stops early does not pay for the hop searches of the pieces it
+        never reaches.
+
+        The moves of a piece are generated when the generator reaches the piece, on the
+        board as it is then. A consumer may play moves between two actions, as long as
+        it takes them back before asking for the next one.
+
+        The orders are:
+            "hops": the hops of every piece, in cell order, then all steps.
+            "advance": piece by piece, starting with the pieces that have the most room
+                left to advance towards the far end of the board, and for each piece from
+                the move that advances it the most. No move advances a piece by more rows
+                than that room, so a consumer looking for the largest advance can stop at
+                the first piece whose room is smaller than the best advance found.
+
+        Args:
+            state (tuple): The current state of the game.
+            order (str): "hops" or "advance".
+
+        Yields:
+            tuple: The legal actions of the player to move, see actions.
+        """
         player = state[0]
         board = state[1]
-        player_piece_pos_list = board.getPlayerPiecePositions(player)
-        for pos in player_piece_pos_list:
-            for adj_pos in board.adjacentPositions(pos):
-                if board.isEmptyPosition(adj_pos):
-                    action_list.append((pos, adj_pos))
-
-        for pos in player_piece_pos_list:
-            boardCopy = copy.deepcopy(board)
-            boardCopy.board_status[pos] = 0
-            for new_pos in boardCopy.getAllHopPositions(pos):
-                if (pos, new_pos) not in action_list:
-                    action_list.append((pos, new_pos))
+        status = board.status
+        positions = board.geometry.positions
+        adjacent = board.geometry.adjacent
+        if order == "hops":
+            piece_cells = board.getPlayerPieceCells(player)
+            for cell in piece_cells:
+                for new_cell in self._hop_cells(board, cell):
+                    yield (positions[cell], positions[new_cell])
+            for cell in piece_cells:
+                for adj_cell in adjacent[cell]:
+                    if status[adj_cell] == 0:
+                        yield (positions[cell], positions[adj_cell])
+        elif order == "advance":
+            row_of = board.geometry.row_of
+            # player 1 advances towards row 1, player 2 towards the last row, and cells
+            # are numbered row by row
+            sign = 1 if player == 1 else -1
+            for cell in sorted(board.pieces[player], reverse=player == 1):
+                new_cells = [c for c in adjacent[cell] if status[c] == 0]
+                new_cells += self._hop_cells(board, cell)
+                new_cells.sort(key=lambda c: sign * row_of[c])
+                for new_cell in new_cells:
+                    yield (positions[cell], positions[new_cell])
+        else:
+            raise ValueError(f"Unknown action order: {order}")
+
+    def hop_path(
+        self, state: State, action: Tuple[Tuple[int, int], Tuple[int, int]]
+    ) -> List[Tuple[int, int]]:
+        """
+        Returns the chain of positions a piece passes through when playing the given action.
 
-        return action_list
+        Args:
+            state (tuple): The state the action is played in.
+            action (tuple): The action to trace.
+
+        Returns:
+            list: The positions from action[0] to action[1]. A step has no intermediate
+                positions, and an action that is not reachable yields an empty list.
+        """
+        board = state[1]
+        if action[1] in board.adjacentPositions(action[0]):
+            return [action[0], action[1]]
+        piece = board.board_status[action[0]]
+        board.board_status[action[0]] = 0
+        try:
+            paths = board.getAllHopPaths(action[0])
+        finally:
+            board.board_status[action[0]] = piece
+        return paths.get(action[1], [])
 
     def player(self, state: State) -> int:
         """
@@ -127,30 +302,7 @@ class ChineseChecker(object):
         Returns:
             tuple: The successor state.
         """
-        move_opp = False
-        player = state[0]
-        board = copy.deepcopy(state[1])
-        board.board_status[action[1]] = board.board_status[action[0]]
-
-        if (
-            str(action[1]) in self.board.player1_pos
-            and board.board_status[action[1]] == 3
-            and player == 1
-        ):
-            if self.board.player1_pos[str(action[1])] == False:
-                move_opp = True
-
-        elif (
-            str(action[1]) in self.board.player2_pos
-            and board.board_status[action[1]] == 4
-            and player == 2
-        ):
-            if self.board.player2_pos[str(action[1])] == False:
-                move_opp = True
-
-        board.board_status[action[0]] = 0
-
-        return (3 - player, board, move_opp)
+        return self.apply((state[0], state[1].copy()), action)[0]
 
     def opp_succ(
         self,
@@ -169,15 +321,102 @@ class ChineseChecker(object):
         Returns:
             tuple: The successor state.
         """
+        return self.opp_apply((state[0], state[1].copy()), action, last_action)[0]
+
+    def apply(
+        self, state: State, action: Tuple[Tuple[int, int], Tuple[int, int]]
+    ) -> Tuple[Tuple[int, Board, bool], Undo_token]:
+        """
+        Applies the given action for the current player in place, on the board of the state.
+
+        The successor state shares the board with the given state. Call undo with the
+        returned token to restore the board before using the given state again.
+
+        Args:
+            state (tuple): The current state of the game.
+            action (tuple): The action to apply.
+
+        Returns:
+            tuple: The successor state and the token that undoes the action.
+        """
+        player = state[0]
+        board = state[1]
+        src = board.geometry.index[action[0]]
+        dst = board.geometry.index[action[1]]
+        captured = board.movePiece(src, dst)
+
         move_opp = False
+        if player == 1 and board.status[dst] == 3:
+            move_opp = board.player1_pos.get(str(action[1])) is False
+        elif player == 2 and board.status[dst] == 4:
+            move_opp = board.player2_pos.get(str(action[1])) is False
+
+        return (3 - player, board, move_opp), Undo_token(state, src, dst, captured)
+
+    def opp_apply(
+        self,
+        state: State,
+        action: Tuple[Tuple[int, int], Tuple[int, int]],
+        last_action: Tuple[Tuple[int, int], Tuple[int, int]],
+    ) -> Tuple[Tuple[int, Board, bool], Undo_token]:
+        """
+        Applies the bonus move of the opponent's piece in place, and marks the special cell
+        reached by last_action as used so that it does not grant another bonus move.
+
+        Args:
+            state (tuple): The current state of the game.
+            action (tuple): The action to apply.
+            last_action (tuple): The last action taken.
+
+        Returns:
+            tuple: The successor state and the token that undoes the action.
+        """
         player = state[0]
-        print(action)
-        board = copy.deepcopy(state[1])
-        board.board_status[action[1]] = board.board_status[action[0]]
-        board.board_status[action[0]] = 0
-        if 3 - player == 1:
-            self.board.player1_pos[str(last_action[1])] = True
-        elif 3 - player == 2:
-            self.board.player2_pos[str(last_action[1])] = True
+        board = state[1]
+        src = board.geometry.index[action[0]]
+        dst = board.geometry.index[action[1]]
+        captured = board.movePiece(src, dst)
 
-        return (player, board, move_opp)
+        flag_player = 3 - player
+        flag_key = str(last_action[1])
+        flag_value = board.setBonusFlag(flag_player, flag_key, True)
+
+        token = Undo_token(state, src, dst, captured, flag_player, flag_key, flag_value)
+        return (player, board, False), token
+
+    def undo(self, token: Undo_token) -> State:
+        """
+        Takes back a move made by apply or opp_apply.
+
+        Tokens must be undone in the reverse order of the moves that produced them.
+
+        Args:
+            token (Undo_token): The token returned by apply or opp_apply.
+
+        Returns:
+            tuple: The state before the move.
+        """
+        board = token.state[1]
+        board.unmovePiece(token.src, token.dst, token.captured)
+        if token.flag_key is not None:
+            board.setBonusFlag(token.flag_player, token.flag_key, token.flag_value)
+        return token.state
+
+    def state_key(self, state: State) -> int:
+        """
+        Returns the Zobrist key of a state, for use with a TranspositionTable.
+
+        The key covers the board, the used bonus-move flags, the player to move and
+        whether a bonus move is pending.
+
+        Args:
+            state (tuple): The state to hash.
+
+        Returns:
+            int: The 64-bit key of the state.
+        """
+        board = state[1]
+        key = board.zobrist ^ board.geometry.zobrist_player[state[0]]
+        if len(state) > 2 and state[2]:
+            key ^= board.geometry.zobrist_bonus
+        return key
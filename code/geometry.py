@@ -0,0 +1,293 @@
+"""
+This module defines the BoardGeometry class, which holds everything about a board layout
+that depends only on the board size and the number of piece rows.
+
+Classes:
+    BoardGeometry: The precomputed cell layout shared by all boards of one configuration.
+
+Functions:
+    get_geometry(size, piece_rows): Returns the shared BoardGeometry for a configuration.
+"""
+
+import random
+from typing import Dict, List, Tuple
+
+
+# Direction indices into BoardGeometry.neighbours, in the order the board has always
+# enumerated them.
+LEFT = 0
+RIGHT = 1
+UP_LEFT = 2
+UP_RIGHT = 3
+DOWN_LEFT = 4
+DOWN_RIGHT = 5
+DIRECTIONS = (LEFT, RIGHT, UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT)
+OPPOSITE = (RIGHT, LEFT, DOWN_RIGHT, DOWN_LEFT, UP_RIGHT, UP_LEFT)
+# Directions along which cell indices increase, since cells are numbered row by row.
+ASCENDING = (RIGHT, DOWN_LEFT, DOWN_RIGHT)
+
+# Sentinel for a neighbour that falls off the board.
+OFF_BOARD = -1
+
+# Number of values a cell can hold: empty, the two players, and their special pieces.
+CELL_VALUES = 5
+# cell value -> player owning the piece, 0 for an empty cell
+OWNER = (0, 1, 2, 1, 2)
+
+
+class BoardGeometry(object):
+    """
+    BoardGeometry maps board coordinates to flat cell indices and back, and holds the
+    neighbour tables and hop rays of every cell in the six directions, as well as the
+    Zobrist keys used to hash positions.
+
+    Cells are numbered row by row, from the top row to the bottom row and from left to
+    right inside a row, which is the same order in which the original dict-based board
+    enumerated its positions.
+    """
+
+    def __init__(self, size: int, piece_rows: int):
+        """
+        Builds the cell index for a board of the given size and piece rows.
+
+        Args:
+            size (int): The size of the board.
+            piece_rows (int): The number of rows occupied by pieces at the start.
+        """
+        self.size = size
+        self.piece_rows = piece_rows
+
+        # index -> (row, col) and (row, col) -> index
+        self.positions: List[Tuple[int, int]] = []
+        self.index: Dict[Tuple[int, int], int] = {}
+        # row -> list of the cell indices in that row, row 0 is unused
+        self.rows: List[List[int]] = [[]]
+        for row in range(1, size * 2):
+            row_cells = []
+            for col in range(1, self.getColNum(row) + 1):
+                self.index[(row, col)] = len(self.positions)
+                row_cells.append(len(self.positions))
+                self.positions.append((row, col))
+            self.rows.append(row_cells)
+        self.num_cells = len(self.positions)
+        # cell -> row
+        self.row_of: List[int] = [pos[0] for pos in self.positions]
+
+        # Special cells: the first two cells of the second row of each goal region, counted
+        # from the far edge. A player's special piece reaching one of its special cells
+        # earns a bonus move, once per cell. They are also where the opponent's special
+        # pieces start. special_row[player] is the row of the player's special cells.
+        self.special_row = (0, 2, size * 2 - 2)
+        self.special_cells: Tuple[Tuple[int, ...], ...] = tuple(
+            tuple(self.index[(self.special_row[p], col)] for col in (1, 2)) if p else ()
+            for p in range(3)
+        )
+        # player -> keys of the player's bonus-move flags, the special cells as strings
+        self.special_keys: Tuple[Tuple[str, ...], ...] = tuple(
+            tuple(str(self.positions[cell]) for cell in cells) for cells in self.special_cells
+        )
+
+        self.initial_status = bytearray(self.num_cells)
+        for row in range(1, size * 2):
+            for cell in self.rows[row]:
+                if row <= piece_rows:
+                    self.initial_status[cell] = 2
+                elif row >= size * 2 - piece_rows:
+                    self.initial_status[cell] = 1
+        for cell in self.special_cells[1]:
+            self.initial_status[cell] = 4
+        for cell in self.special_cells[2]:
+            self.initial_status[cell] = 3
+        # bitset of the occupied cells at the start, bit i standing for cell i
+        self.initial_occupied = sum(1 << c for c, v in enumerate(self.initial_status) if v)
+        # player -> cells of that player's pieces at the start, index 0 is unused
+        self.initial_pieces: Tuple[Tuple[int, ...], ...] = tuple(
+            tuple(c for c, v in enumerate(self.initial_status) if v and OWNER[v] == p)
+            for p in range(3)
+        )
+
+        # Goal regions: player 1 moves to the top piece_rows rows, player 2 to the
+        # bottom ones. goal_owner[cell] is the player whose goal the cell belongs to.
+        # A cell scores for its owner when it holds one of the owner's pieces, and counts
+        # as filled when it holds a normal piece, or a special piece on the special row.
+        self.goal_owner = bytearray(self.num_cells)
+        self.goal_size = [0, 0, 0]
+        self.goal_score_table = bytearray(self.num_cells * CELL_VALUES)
+        self.goal_filled_table = bytearray(self.num_cells * CELL_VALUES)
+        for row in range(1, size * 2):
+            if row <= piece_rows:
+                player = 1
+            elif row >= size * 2 - piece_rows:
+                player = 2
+            else:
+                continue
+            special_row = self.special_row[player]
+            for cell in self.rows[row]:
+                self.goal_owner[cell] = player
+                self.goal_size[player] += 1
+                base = cell * CELL_VALUES
+                self.goal_score_table[base + player] = 1
+                self.goal_score_table[base + player + 2] = 1
+                self.goal_filled_table[base + player] = 1
+                if row == special_row:
+                    self.goal_filled_table[base + player + 2] = 1
+        # player -> (score, filled) of the initial position, index 0 is unused
+        self.initial_goal_score = [0, 0, 0]
+        self.initial_goal_filled = [0, 0, 0]
+        for cell, value in enumerate(self.initial_status):
+            player = self.goal_owner[cell]
+            index = cell * CELL_VALUES + value
+            self.initial_goal_score[player] += self.goal_score_table[index]
+            self.initial_goal_filled[player] += self.goal_filled_table[index]
+
+        # direction -> cell -> neighbouring cell, or OFF_BOARD
+        self.neighbours: List[List[int]] = [
+            [self._neighbour(pos, direction) for pos in self.positions]
+            for direction in DIRECTIONS
+        ]
+        # cell -> on-board neighbours, in direction order
+        self.adjacent: List[Tuple[int, ...]] = [
+            tuple(
+                self.neighbours[direction][cell]
+                for direction in DIRECTIONS
+                if self.neighbours[direction][cell] != OFF_BOARD
+            )
+            for cell in range(self.num_cells)
+        ]
+        # cell -> direction -> cells along the ray from the cell to the edge of the board
+        self.rays: List[Tuple[Tuple[int, ...], ...]] = [
+            tuple(self._ray(cell, direction) for direction in DIRECTIONS)
+            for cell in range(self.num_cells)
+        ]
+        # cell -> rays long enough to hop along, i.e. with room to hop over and land
+        self.hop_rays: List[Tuple[Tuple[int, ...], ...]] = [
+            tuple(ray for ray in rays if len(ray) >= 2) for rays in self.rays
+        ]
+        # cell -> the hop rays, each with what the bitset hop search needs:
+        # (ray, bitset of the ray's cells, whether cell indices increase along the ray,
+        # whether the ray runs along a row)
+        self.hop_ray_masks: List[Tuple[Tuple[Tuple[int, ...], int, bool, bool], ...]] = [
+            tuple(
+                (ray, sum(1 << c for c in ray), direction in ASCENDING, direction in (LEFT, RIGHT))
+                for direction, ray in zip(DIRECTIONS, rays)
+                if len(ray) >= 2
+            )
+            for rays in self.rays
+        ]
+
+        # Zobrist keys, seeded from the configuration so that hashes are reproducible
+        # across processes. zobrist[cell * CELL_VALUES + value]; empty cells hash to 0.
+        rng = random.Random(f"zobrist {size} {piece_rows}")
+        self.zobrist: List[int] = []
+        for cell in range(self.num_cells):
+            self.zobrist.append(0)
+            self.zobrist.extend(rng.getrandbits(64) for _ in range(CELL_VALUES - 1))
+        # state[0] -> key of the player to move, and the key of a pending bonus move
+        self.zobrist_player = (0, rng.getrandbits(64), rng.getrandbits(64))
+        self.zobrist_bonus = rng.getrandbits(64)
+        self._zobrist_flags: Dict[Tuple[int, str], int] = {}
+        self.initial_hash = 0
+        for cell, value in enumerate(self.initial_status):
+            self.initial_hash ^= self.zobrist[cell * CELL_VALUES + value]
+
+    def zobristFlag(self, player: int, key: str) -> int:
+        """
+        Returns the Zobrist key of a used bonus-move cell.
+
+        Args:
+            player (int): The player owning the flag (1 or 2).
+            key (str): The flag key, i.e. the special cell formatted as a string.
+
+        Returns:
+            int: The 64-bit key.
+        """
+        flag = (player, key)
+        value = self._zobrist_flags.get(flag)
+        if value is None:
+            value = random.Random(f"zobrist flag {player} {key}").getrandbits(64)
+            self._zobrist_flags[flag] = value
+        return value
+
+    def _ray(self, cell: int, direction: int) -> Tuple[int, ...]:
+        """
+        Walks the neighbour table from a cell to the edge of the board.
+
+        Args:
+            cell (int): The starting cell index, which is not part of the ray.
+            direction (int): One of the direction constants of this module.
+
+        Returns:
+            tuple: The cell indices along the ray, nearest first.
+        """
+        step = self.neighbours[direction]
+        ray = []
+        cell = step[cell]
+        while cell != OFF_BOARD:
+            ray.append(cell)
+            cell = step[cell]
+        return tuple(ray)
+
+    def _neighbour(self, pos: Tuple[int, int], direction: int) -> int:
+        """
+        Computes the neighbour of a position in one direction.
+
+        Args:
+            pos (tuple): The current position.
+            direction (int): One of the direction constants of this module.
+
+        Returns:
+            int: The cell index of the neighbour, or OFF_BOARD.
+        """
+        row, col = pos
+        upper_half = row <= self.size
+        lower_half = row >= self.size
+        if direction == LEFT:
+            target = (row, col - 1)
+        elif direction == RIGHT:
+            target = (row, col + 1)
+        elif direction == UP_LEFT:
+            target = (row - 1, col - 1) if upper_half else (row - 1, col)
+        elif direction == UP_RIGHT:
+            target = (row - 1, col) if upper_half else (row - 1, col + 1)
+        elif direction == DOWN_LEFT:
+            target = (row + 1, col - 1) if lower_half else (row + 1, col)
+        else:
+            target = (row + 1, col) if lower_half else (row + 1, col + 1)
+        return self.index.get(target, OFF_BOARD)
+
+    def getColNum(self, row: int) -> int:
+        """
+        Returns the number of columns in the given row.
+
+        Args:
+            row (int): The row number.
+
+        Returns:
+            int: The number of columns in the given row.
+        """
+        if 1 <= row <= self.size:
+            return row
+        else:
+            return self.size * 2 - row
+
+
+_geometry_cache: Dict[Tuple[int, int], BoardGeometry] = {}
+
+
+def get_geometry(size: int, piece_rows: int) -> BoardGeometry:
+    """
+    Returns the BoardGeometry for the given configuration, building it on first use.
+
+    Args:
+        size (int): The size of the board.
+        piece_rows (int): The number of rows occupied by pieces at the start.
+
+    Returns:
+        BoardGeometry: The geometry shared by all boards with this configuration.
+    """
+    key = (size, piece_rows)
+    geometry = _geometry_cache.get(key)
+    if geometry is None:
+        geometry = BoardGeometry(size, piece_rows)
+        _geometry_cache[key] = geometry
+    return geometry
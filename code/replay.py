@@ -0,0 +1,178 @@
+"""
+This module defines a compact binary replay format for games of Chinese Checkers.
+
+A replay stores the board configuration and the list of moves instead of boards:
+
+    header: b"CCRP", version (uint8), board size (uint16), piece rows (uint16)
+    moves:  source cell (uint16), destination cell (uint16), repeated until the end
+
+All integers are little-endian and cells are BoardGeometry cell indices. The highest bit
+of a move's source cell marks a bonus move, which is played by the same player as the
+move before it. Any position of the game is rebuilt by replaying the moves through
+ChineseChecker.succ and ChineseChecker.opp_succ.
+
+Run from the `code` directory to print a position:
+
+    python replay.py logs/<run>/replays/game_00000.ccr --ply 10
+
+Classes:
+    ReplayWriter: Records the moves of a game.
+    Replay: A recorded game that can rebuild its positions.
+
+Functions:
+    loadReplay(path): Reads a replay file.
+"""
+
+import argparse
+import struct
+from typing import Iterator, List, Tuple
+
+from game import Action, ChineseChecker, State
+from geometry import get_geometry
+
+
+REPLAY_MAGIC = b"CCRP"
+REPLAY_VERSION = 1
+# magic, version, board size, piece rows
+_HEADER = struct.Struct("<4sBHH")
+# source cell, destination cell
+_MOVE = struct.Struct("<HH")
+# set on the source cell of a bonus move
+BONUS_FLAG = 0x8000
+
+
+class ReplayWriter(object):
+    """
+    ReplayWriter records the moves of one game into an in-memory replay.
+    """
+
+    def __init__(self, size: int, piece_rows: int):
+        """
+        Starts a replay of a game on the given board configuration.
+
+        Args:
+            size (int): The size of the board.
+            piece_rows (int): The number of rows occupied by pieces at the start.
+        """
+        self.geometry = get_geometry(size, piece_rows)
+        if self.geometry.num_cells > BONUS_FLAG:
+            raise ValueError(f"Board of size {size} is too large for the replay format")
+        self.data = bytearray(_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, size, piece_rows))
+
+    def addMove(self, action: Action, bonus: bool = False) -> None:
+        """
+        Records a move.
+
+        Args:
+            action (tuple): The move, as (source position, destination position).
+            bonus (bool): Whether the move is the bonus move of the player who just moved.
+        """
+        src = self.geometry.index[action[0]]
+        dst = self.geometry.index[action[1]]
+        self.data += _MOVE.pack(src | BONUS_FLAG if bonus else src, dst)
+
+    def getvalue(self) -> bytes:
+        """
+        Returns the encoded replay.
+
+        Returns:
+            bytes: The replay, ready to be written to a file.
+        """
+        return bytes(self.data)
+
+
+class Replay(object):
+    """
+    Replay is a recorded game. Its plies are the recorded moves, bonus moves included,
+    and ply 0 is the initial position.
+    """
+
+    def __init__(self, data: bytes):
+        """
+        Decodes a replay.
+
+        Args:
+            data (bytes): The replay, as produced by ReplayWriter.getvalue.
+        """
+        magic, version, self.size, self.piece_rows = _HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC:
+            raise ValueError("Not a Chinese Checkers replay")
+        if version != REPLAY_VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+        positions = get_geometry(self.size, self.piece_rows).positions
+        # (move, whether it is a bonus move)
+        self.moves: List[Tuple[Action, bool]] = []
+        for src, dst in _MOVE.iter_unpack(data[_HEADER.size :]):
+            action = (positions[src & ~BONUS_FLAG], positions[dst])
+            self.moves.append((action, bool(src & BONUS_FLAG)))
+
+    def states(self) -> Iterator[State]:
+        """
+        Replays the game.
+
+        Yields:
+            tuple: The state at every ply, starting with the initial state.
+        """
+        ccgame = ChineseChecker(self.size, self.piece_rows)
+        state = ccgame.startState()
+        yield state
+        last_action = None
+        for action, bonus in self.moves:
+            if bonus:
+                state = ccgame.opp_succ(state, action, last_action)
+            else:
+                state = ccgame.succ(state, action)
+                last_action = action
+            yield state
+
+    def stateAt(self, ply: int) -> State:
+        """
+        Rebuilds the state at a ply.
+
+        Args:
+            ply (int): The number of moves played, between 0 and len(moves).
+
+        Returns:
+            tuple: The state after the first ply moves.
+        """
+        if not 0 <= ply <= len(self.moves):
+            raise IndexError(f"Ply {ply} is out of range 0..{len(self.moves)}")
+        for i, state in enumerate(self.states()):
+            if i == ply:
+                return state
+        raise AssertionError("unreachable")
+
+
+def loadReplay(path: str) -> Replay:
+    """
+    Reads a replay file.
+
+    Args:
+        path (str): The path of the replay file.
+
+    Returns:
+        Replay: The recorded game.
+    """
+    with open(path, "rb") as f:
+        return Replay(f.read())
+
+
+def parser():
+    _parser = argparse.ArgumentParser(description="Chinese Checkers replay viewer")
+    _parser.add_argument("replay", type=str, help="The replay file.")
+    _parser.add_argument(
+        "--ply",
+        type=int,
+        default=None,
+        help="Print the position after this many moves. Default is the final position.",
+    )
+    return _parser
+
+
+if __name__ == "__main__":
+    args = parser().parse_args()
+    replay = loadReplay(args.replay)
+    ply = len(replay.moves) if args.ply is None else args.ply
+    state = replay.stateAt(ply)
+    print(f"Board size {replay.size}, {replay.piece_rows} piece rows, ply {ply}/{len(replay.moves)}")
+    print(state[1].as_formatted_string())
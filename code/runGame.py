@@ -1,30 +1,49 @@
 import argparse
+import concurrent.futures
 import datetime
+import hashlib
 import numpy as np
 import logging
+import logging.handlers
 import json
+import multiprocessing
 import time
-import tkinter as tk
 import tqdm
 import pathlib
+import queue
+import threading
 import tqdm.contrib
 import tqdm.contrib.logging
 import yaml
 
 from copy import deepcopy
 from collections import namedtuple
-from typing import Callable, Dict, Any, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Any, List, Optional
 
 from agent import *
+from batch import BatchGames
 from board import Board
 from game import ChineseChecker
-from board import Board
-# import datetime
-import tkinter as tk
-from UI import GameBoard
+from replay import ReplayWriter
+from timecontrol import TimedAgent
+
+if TYPE_CHECKING:
+    from UI import GameBoard
 
 logger = logging.getLogger(__name__)
 
+# Set up by the GUI in __main__. They stay None in headless mode, where neither
+# tkinter nor the UI module is imported.
+root = None
+B = None
+display_board: Optional["GameBoard"] = None
+
+# Set in viewer mode: the queue runGame publishes boards to, for a window to show them,
+# and the minimum time in seconds between two published boards.
+frame_queue: Optional[Any] = None
+frame_interval = 0.0
+_last_frame_time = 0.0
+
 class TqdmLoggingHandler(logging.Handler):
     def __init__(self, level=logging.NOTSET):
         super().__init__(level)
@@ -38,79 +57,225 @@ class TqdmLoggingHandler(logging.Handler):
             self.handleError(record) 
 
 
+class BoardDump(object):
+    """
+    A log argument that formats a board only when its record is actually emitted.
+    """
+
+    __slots__ = ("board",)
+
+    def __init__(self, board: Board):
+        self.board = board
+
+    def __str__(self) -> str:
+        return self.board.as_formatted_string()
+
+
+def setFrameQueue(frames: Optional[Any], interval: float = 0.0) -> None:
+    """
+    Makes runGame publish its boards to a queue. Also the initializer of the worker
+    processes of parallel tournaments, which then publish to the same queue.
+
+    Args:
+        frames (Queue, optional): The queue of frames, or None to stop publishing.
+        interval (float): The minimum time in seconds between two published boards.
+    """
+    global frame_queue, frame_interval
+    frame_queue = frames
+    frame_interval = interval
+
+
+def publishFrame(board: Board, final: bool = False) -> None:
+    """
+    Publishes a board to the frame queue as (board size, piece rows, cell values).
+
+    Boards that come sooner than frame_interval after the previous one, or that find the
+    queue full, are dropped: the games never wait for the viewer.
+
+    Args:
+        board (Board): The board to publish.
+        final (bool): Whether this is the final board of a game, which is not rate-limited.
+    """
+    global _last_frame_time
+    now = time.perf_counter()
+    if not final and now - _last_frame_time < frame_interval:
+        return
+    _last_frame_time = now
+    try:
+        frame_queue.put_nowait((board.size, board.piece_rows, bytes(board.status)))
+    except queue.Full:
+        pass
+
+
 Run_game_result = namedtuple(
     "Run_game_result",
-    ["winner", "iter", "board", "time_used", "iter_time_list"],
-    defaults=[0, 0, None, None, None],
+    [
+        "winner",
+        "iter",
+        "board",
+        "time_used",
+        "iter_time_list",
+        "replay",
+        "ply_timings",
+        "timeouts",
+    ],
+    defaults=[0, 0, None, None, None, None, None, None],
+)
+
+# The phases of a ply that runGame times separately: the agent choosing its move, the
+# referee checking it, and the engine playing it, then the same for a bonus move.
+PLY_PHASES = (
+    "think",
+    "validate",
+    "apply",
+    "bonus_think",
+    "bonus_validate",
+    "bonus_apply",
+)
+
+# Everything a worker process needs to play one game of a seeded tournament.
+Game_spec = namedtuple(
+    "Game_spec",
+    [
+        "index",
+        "seed",
+        "board_size",
+        "piece_rows",
+        "player1",
+        "player2",
+        "log_board_every",
+        "move_time",
+        "game_time",
+    ],
+    defaults=[1, None, None],
 )
 
 
-def runGame(ccgame: ChineseChecker, agents: Dict[int, Agent]) -> Run_game_result:
+def runGame(
+    ccgame: ChineseChecker,
+    agents: Dict[int, Agent],
+    display_board: Optional["GameBoard"] = None,
+    show_progress: bool = True,
+    log_board_every: int = 1,
+) -> Run_game_result:
     """
     Runs a single game of Chinese Checkers.
 
+    Without a display board the game runs headless, as fast as the agents allow.
+
     Args:
         ccgame (ChineseChecker): The game instance.
         agents (dict): A dictionary mapping player numbers to their respective agents.
+        display_board (GameBoard, optional): The board widget to draw every ply on.
+        show_progress (bool): Whether to show a progress bar of the game's iterations.
+        log_board_every (int): Log the board every this many iterations, or only the
+            final board if 0. The final board is always logged.
 
     Returns:
         int: The winner of the game (1 for player 1, 2 for player 2, 0 for a tie).
+        The result also has the time of every ply, in total (iter_time_list) and per
+        phase (ply_timings, one dict per ply with the player and the PLY_PHASES played),
+        and the number of moves of each player that ran out of time (timeouts).
     """
+    for agent in agents.values():
+        agent.newGame()
     state = ccgame.startState()
     # print(state)
     max_iter = 200  # deal with some stuck situations
     iter = 0
     start = time.time()
     iter_times = []
+    ply_timings: List[Dict[str, float]] = []
+    timeouts = {1: 0, 2: 0}
+    replay = ReplayWriter(ccgame.size, ccgame.piece_rows)
     inner_bar = tqdm.trange(
         max_iter,
         desc="Game Iteration",
         dynamic_ncols=True,
         position=1,
+        disable=not show_progress,
     )
 
     while (not ccgame.isEnd(state, iter)) and iter < max_iter:
-        time.sleep(0.05)
         iter += 1
         inner_bar.update(1)
-        logger.info(f"Iteration {iter}\n{state[1].as_formatted_string()}")
-
-        display_board.board = state[1]
-        display_board.draw()
-        display_board.update_idletasks()
-        display_board.update()
+        if log_board_every and (iter - 1) % log_board_every == 0:
+            logger.info("Iteration %d\n%s", iter, BoardDump(state[1]))
+        else:
+            logger.info("Iteration %d", iter)
+
+        if display_board is not None:
+            time.sleep(0.05)
+            display_board.board = state[1]
+            display_board.draw()
+            display_board.update_idletasks()
+            display_board.update()
+        if frame_queue is not None:
+            publishFrame(state[1])
 
         iter_start = time.time()
         player = ccgame.player(state)
         agent: Agent = agents[player]
+        timing: Dict[str, float] = {"player": player}
+        phase_start = time.perf_counter()
         # function agent.getAction() modify class member action
         agent.getAction(state)
-        
-        legal_actions = ccgame.actions(state)
-        if agent.action not in legal_actions:
-            agent.action = random.choice(legal_actions)
+        phase_end = time.perf_counter()
+        timing["think"] = phase_end - phase_start
+        if agent.timed_out:
+            timing["timeout"] = True
+            timeouts[player] += 1
+
+        phase_start = phase_end
+        if not ccgame.is_legal(state, agent.action):
+            agent.action = random.choice(ccgame.actions(state))
             logger.warning(f"Invalid action, choosing random action.")
-        logger.info(f"Player {player} action: {agent.action[0]} -> {agent.action[1]}")
+        timing["validate"] = time.perf_counter() - phase_start
+        logger.info("Player %d action: %s -> %s", player, agent.action[0], agent.action[1])
+        replay.addMove(agent.action)
+        phase_start = time.perf_counter()
         state = ccgame.succ(state, agent.action)
+        timing["apply"] = time.perf_counter() - phase_start
         if state[-1]:
-            logger.info(f"Player {player} has another opp action")
+            logger.info("Player %d has another opp action", player)
+            phase_start = time.perf_counter()
             agent.oppAction(state)
-            legal_actions = ccgame.opp_actions(state)
-            if agent.opp_action not in legal_actions:
-                agent.opp_action = random.choice(legal_actions)
+            phase_end = time.perf_counter()
+            timing["bonus_think"] = phase_end - phase_start
+            if agent.timed_out:
+                timing["bonus_timeout"] = True
+                timeouts[player] += 1
+
+            phase_start = phase_end
+            if not ccgame.is_legal(state, agent.opp_action):
+                agent.opp_action = random.choice(ccgame.opp_actions(state))
                 logger.warning(f"Invalid opp action, choosing random action.")
-            logger.info(f"Player {player} opp action: {agent.opp_action[0]} -> {agent.opp_action[1]}")
+            timing["bonus_validate"] = time.perf_counter() - phase_start
+            logger.info(
+                "Player %d opp action: %s -> %s",
+                player,
+                agent.opp_action[0],
+                agent.opp_action[1],
+            )
+            replay.addMove(agent.opp_action, bonus=True)
+            phase_start = time.perf_counter()
             state = ccgame.opp_succ(state, agent.opp_action, agent.action)
+            timing["bonus_apply"] = time.perf_counter() - phase_start
         iter_end = time.time()
         iter_times.append(iter_end - iter_start)
+        ply_timings.append(timing)
 
     end = time.time()
+    logger.info("Final board at iteration %d\n%s", iter, BoardDump(state[1]))
 
-    display_board.board = state[1]
-    display_board.draw()
-    display_board.update_idletasks()
-    display_board.update()
-    time.sleep(0.1)
+    if display_board is not None:
+        display_board.board = state[1]
+        display_board.draw()
+        display_board.update_idletasks()
+        display_board.update()
+        time.sleep(0.1)
+    if frame_queue is not None:
+        publishFrame(state[1], final=True)
 
     ret = Run_game_result(
         winner=0,
@@ -118,6 +283,9 @@ def runGame(ccgame: ChineseChecker, agents: Dict[int, Agent]) -> Run_game_result
         board=state[1].as_formatted_string(),
         time_used=end - start,
         iter_time_list=iter_times,
+        replay=replay.getvalue(),
+        ply_timings=ply_timings,
+        timeouts={"player1": timeouts[1], "player2": timeouts[2]},
     )
 
     is_end, winner = state[1].isEnd(iter)
@@ -134,7 +302,7 @@ def runGame(ccgame: ChineseChecker, agents: Dict[int, Agent]) -> Run_game_result
         logger.info(f"Game stuck at {iter=} with winner {winner}")
         ret = ret._replace(winner=winner)
         logger.debug(f"new winner: {winner}")
-        logger.debug(f"{ret = }")
+        logger.debug("winner %d at iter %d after %.3fs", ret.winner, ret.iter, ret.time_used)
 
     logger.info(f"Game over! Winner: {winner}")
     logger.info(f"Total time used: {end - start}")
@@ -142,7 +310,12 @@ def runGame(ccgame: ChineseChecker, agents: Dict[int, Agent]) -> Run_game_result
 
 
 def simulateMultipleGames(
-    agents_dict: Dict[int, Agent], simulation_times: int, ccgame: ChineseChecker
+    agents_dict: Dict[int, Agent],
+    simulation_times: int,
+    ccgame: ChineseChecker,
+    display_board: Optional["GameBoard"] = None,
+    on_result: Optional[Callable[[int, Run_game_result], None]] = None,
+    log_board_every: int = 1,
 ) -> List[Run_game_result]:
     """
     Simulates multiple games of Chinese Checkers and tracks the results.
@@ -151,9 +324,13 @@ def simulateMultipleGames(
         agents_dict (dict): A dictionary mapping player numbers to their respective agents.
         simulation_times (int): The number of games to simulate.
         ccgame (ChineseChecker): The game instance.
+        display_board (GameBoard, optional): The board widget to draw the games on.
+        on_result (function, optional): Called with the game's number and its result as
+            soon as each game finishes. The results are then handed over instead of kept.
+        log_board_every (int): How often the games log the board, see runGame.
 
     Returns:
-        None
+        list: The results of the games, empty if on_result is given.
     """
     tie_p1_p2_count = [0, 0, 0] # index 0, 1, 2 for tie, player1 win, player2 win respectively
 
@@ -170,9 +347,14 @@ def simulateMultipleGames(
     for i in outer_bar:
         logger.info(f"=== Game {i} ===")
 
-        run_result = runGame(ccgame, agents_dict)
+        run_result = runGame(
+            ccgame, agents_dict, display_board, log_board_every=log_board_every
+        )
         # print(run_result)
-        ret.append(run_result)
+        if on_result is not None:
+            on_result(i, run_result)
+        else:
+            ret.append(run_result)
 
         winner = run_result.winner
         tie_p1_p2_count[winner] += 1
@@ -181,6 +363,338 @@ def simulateMultipleGames(
     return ret
 
 
+def runSeededGame(spec: Game_spec) -> Run_game_result:
+    """
+    Plays one game of a seeded tournament with a fresh game instance and fresh agents.
+
+    The random number generators are seeded from the game's own seed, so the result only
+    depends on the spec, not on which process plays it or what it played before.
+
+    Args:
+        spec (Game_spec): The game to play.
+
+    Returns:
+        Run_game_result: The result of the game.
+    """
+    random.seed(spec.seed)
+    np.random.seed(random.getrandbits(32))
+    ccgame = ChineseChecker(size=spec.board_size, piece_rows=spec.piece_rows)
+    agents_dict = {
+        player: createAgent(ccgame, name, spec.move_time, spec.game_time, seeded=True)
+        for player, name in ((1, spec.player1), (2, spec.player2))
+    }
+    logger.info(f"=== Game {spec.index} ===")
+    try:
+        return runGame(
+            ccgame, agents_dict, show_progress=False, log_board_every=spec.log_board_every
+        )
+    finally:
+        for agent in agents_dict.values():
+            agent.close()
+
+
+def simulateSeededGames(
+    specs: List[Game_spec],
+    workers: int,
+    on_result: Optional[Callable[[int, Run_game_result], None]] = None,
+) -> List[Run_game_result]:
+    """
+    Plays the games of a seeded tournament, spread over a pool of worker processes.
+
+    Args:
+        specs (list): The games to play.
+        workers (int): The number of worker processes. With 1, the games are played in
+            this process, with the same results.
+        on_result (function, optional): Called with the position of the game in specs and
+            its result as soon as each game finishes, in the order of specs. The results
+            are then handed over instead of kept.
+
+    Returns:
+        list: The results, in the order of specs, empty if on_result is given.
+    """
+    tie_p1_p2_count = [0, 0, 0] # index 0, 1, 2 for tie, player1 win, player2 win respectively
+
+    ret: List[Run_game_result] = []
+
+    outer_bar = tqdm.tqdm(
+        total=len(specs),
+        desc="Simulations",
+        dynamic_ncols=True,
+        position=0,
+    )
+    outer_bar.set_postfix_str(f"T|P1:P2: 0|0:0")
+
+    executor = None
+    if workers > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=setFrameQueue,
+            initargs=(frame_queue, frame_interval),
+        )
+        run_results = executor.map(runSeededGame, specs)
+    else:
+        run_results = map(runSeededGame, specs)
+
+    try:
+        for i, run_result in enumerate(run_results):
+            if on_result is not None:
+                on_result(i, run_result)
+            else:
+                ret.append(run_result)
+
+            winner = run_result.winner
+            tie_p1_p2_count[winner] += 1
+            tie_count, p1_count, p2_count = tie_p1_p2_count
+            outer_bar.update(1)
+            outer_bar.set_postfix_str(f"T|P1:P2: {tie_count}|{p1_count}:{p2_count}")
+    finally:
+        outer_bar.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return ret
+
+
+def simulateBatchGames(
+    player1: str,
+    player2: str,
+    simulation_times: int,
+    ccgame: ChineseChecker,
+    batch_size: int = 1000,
+    seed: Optional[int] = None,
+    on_result: Optional[Callable[[int, Run_game_result], None]] = None,
+) -> List[Run_game_result]:
+    """
+    Simulates games between baseline agents in lockstep batches with the NumPy engine.
+
+    Args:
+        player1 (str): The agent name of player 1, RandomAgent or SimpleGreedyAgent.
+        player2 (str): The agent name of player 2, RandomAgent or SimpleGreedyAgent.
+        simulation_times (int): The number of games to simulate.
+        ccgame (ChineseChecker): The game instance, which provides the board configuration.
+        batch_size (int): The number of games advanced together.
+        seed (int, optional): The seed of the batches' random number generators.
+        on_result (function, optional): Called with the game's number and its result as
+            soon as each batch finishes. The results are then handed over instead of kept.
+
+    Returns:
+        list: The results of the games, empty if on_result is given.
+    """
+    ret: List[Run_game_result] = []
+    tie_p1_p2_count = [0, 0, 0] # index 0, 1, 2 for tie, player1 win, player2 win respectively
+    outer_bar = tqdm.tqdm(
+        total=simulation_times,
+        desc="Simulations",
+        dynamic_ncols=True,
+        position=0,
+    )
+    for batch_index, first in enumerate(range(0, simulation_times, batch_size)):
+        num_games = min(batch_size, simulation_times - first)
+        batch = BatchGames(
+            ccgame.size,
+            ccgame.piece_rows,
+            num_games,
+            player1,
+            player2,
+            seed=None if seed is None else (seed, batch_index),
+        )
+        for i, record in enumerate(batch.run(), first):
+            run_result = Run_game_result(**record)
+            if on_result is not None:
+                on_result(i, run_result)
+            else:
+                ret.append(run_result)
+            tie_p1_p2_count[run_result.winner] += 1
+        outer_bar.update(num_games)
+        tie_count, p1_count, p2_count = tie_p1_p2_count
+        outer_bar.set_postfix_str(f"T|P1:P2: {tie_count}|{p1_count}:{p2_count}")
+    outer_bar.close()
+    return ret
+
+
+# The config keys that decide which games a tournament plays, with their defaults.
+# Results recorded under the same values can be reused when a run is resumed.
+GAME_CONFIG_DEFAULTS = {
+    "board_size": 10,
+    "piece_rows": 4,
+    "player1": "RandomAgent",
+    "player2": "RandomAgent",
+    "seed": None,
+    "batch": False,
+    "move_time": None,
+    "game_time": None,
+}
+
+
+def configFingerprint(config: Dict[str, Any]) -> str:
+    """
+    Identifies the games a configuration plays, to recognize its results when resuming.
+
+    Args:
+        config (dict): The run configuration.
+
+    Returns:
+        str: A short hash of the values of the keys in GAME_CONFIG_DEFAULTS.
+    """
+    game_config = {
+        key: config.get(key, default) for key, default in GAME_CONFIG_DEFAULTS.items()
+    }
+    encoded = json.dumps(game_config, sort_keys=True).encode()
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+def parseResult(result: Run_game_result) -> Dict[str, Any]:
+    """
+    Turns a game result into the record written to the results files, with the
+    statistics of player 1's iteration times added.
+
+    Args:
+        result (Run_game_result): The result of a game.
+
+    Returns:
+        dict: The JSON-serializable record. Its replay is left out, see callback.
+    """
+    record = result._asdict()
+    record["replay"] = None
+    if result.ply_timings is not None:
+        player1_series = [
+            t
+            for t, timing in zip(result.iter_time_list, result.ply_timings)
+            if timing["player"] == 1
+        ]
+    else:
+        # batch games have no per-ply records, but always start with player 1
+        player1_series = record["iter_time_list"][::2]
+    # avg and var
+    record["player1_time_avg"] = float(np.mean(player1_series))
+    record["player1_time_var"] = float(np.var(player1_series))
+    # high 10%, 5%, 1%
+    record["player1_time_high10"] = float(np.percentile(player1_series, 90))
+    record["player1_time_high5"] = float(np.percentile(player1_series, 95))
+    record["player1_time_high1"] = float(np.percentile(player1_series, 99))
+    return record
+
+
+def readResultStream(path: pathlib.Path, fingerprint: str) -> Dict[int, Dict[str, Any]]:
+    """
+    Reads the records of a results stream that belong to one configuration.
+
+    A line cut short by a crash is skipped, and a game recorded twice keeps its last record.
+
+    Args:
+        path (pathlib.Path): The JSONL results file. It does not have to exist.
+        fingerprint (str): The configFingerprint of the configuration.
+
+    Returns:
+        dict: Game number -> record.
+    """
+    records: Dict[int, Dict[str, Any]] = {}
+    if not path.exists():
+        return records
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping a truncated line of {path}")
+                continue
+            if record.get("config") == fingerprint:
+                records[record["game"]] = record
+    return records
+
+
+def trimResultStream(path: pathlib.Path) -> None:
+    """
+    Cuts a results stream back to its last complete line, dropping what a crash left of
+    the line it was writing, so that the records appended next start on a line of their own.
+
+    Args:
+        path (pathlib.Path): The JSONL results file. It does not have to exist.
+    """
+    if not path.exists():
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, 2)
+        position = end
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position < end:
+            logger.warning(f"Dropping a truncated line at the end of {path}")
+            f.truncate(position)
+
+
+def summarizeResults(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Computes the overview statistics of a tournament.
+
+    Args:
+        records (list): The per-game records, as written by parseResult.
+
+    Returns:
+        dict: The overview.
+    """
+    return {
+        "player1_wins": sum(1 for r in records if r["winner"] == 1),
+        "player2_wins": sum(1 for r in records if r["winner"] == 2),
+        "ties": sum(1 for r in records if r["winner"] == 0),
+        "match_iter_avg": np.mean([r["iter"] for r in records]),
+        "match_iter_var": np.var([r["iter"] for r in records]),
+        "match_time_avg": np.mean([r["time_used"] for r in records]),
+        "match_time_var": np.var([r["time_used"] for r in records]),
+        "player1_time_avg": np.mean([r["player1_time_avg"] for r in records]),
+        "player1_timeouts": sum((r.get("timeouts") or {}).get("player1", 0) for r in records),
+        "player2_timeouts": sum((r.get("timeouts") or {}).get("player2", 0) for r in records),
+    }
+
+
+def summarizeTimings(
+    records: List[Dict[str, Any]], agent_names: Dict[int, str]
+) -> Dict[str, Any]:
+    """
+    Aggregates the per-phase ply timings of a tournament per player.
+
+    Args:
+        records (list): The per-game records, as written by parseResult.
+        agent_names (dict): Player number -> agent name.
+
+    Returns:
+        dict: "player1" and "player2" -> the agent name and, per phase of PLY_PHASES that
+        occurred, the number of samples and the mean, p50, p90 and p99 in seconds.
+    """
+    samples: Dict[int, Dict[str, List[float]]] = {
+        player: {phase: [] for phase in PLY_PHASES} for player in (1, 2)
+    }
+    for record in records:
+        for timing in record.get("ply_timings") or ():
+            player_samples = samples[timing["player"]]
+            for phase in PLY_PHASES:
+                if phase in timing:
+                    player_samples[phase].append(timing[phase])
+
+    summary: Dict[str, Any] = {}
+    for player in (1, 2):
+        phases = {}
+        for phase, values in samples[player].items():
+            if not values:
+                continue
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            phases[phase] = {
+                "count": len(values),
+                "mean": float(np.mean(values)),
+                "p50": float(p50),
+                "p90": float(p90),
+                "p99": float(p99),
+            }
+        summary[f"player{player}"] = {"agent": agent_names[player], "phases": phases}
+    return summary
+
+
 def callback(
     ccgame: ChineseChecker,
     config: Optional[Dict[str, Any]] = None,
@@ -198,24 +712,42 @@ def callback(
     if config is None:
         config = {}
 
-    if not config.get("direct_start", False):
-        # not direct start, then the button should be destroyed
+    if B is not None:
+        # started by the button, then the button should be destroyed
         B.destroy()
 
+    workers: int = config.get("workers", 1)  # type: ignore
+    if workers > 1 and config.get("seed") is None:
+        # parallel games are always seeded, so record the seed to be able to replay them
+        config["seed"] = random.randrange(2**31)
+
     if log_dir is not None:
         with open(log_dir / "run_config.yaml", "w") as f:
             yaml.safe_dump(config, f)
 
     agent1_type = config.get("player1", "RandomAgent")
     agent2_type = config.get("player2", "RandomAgent")
-    agent_dict = {
-        1: getAgentCls(agent1_type)(ccgame),
-        2: getAgentCls(agent2_type)(ccgame),
-    }
+    # time limits in seconds, None for no limit; see the timecontrol module
+    move_time: Optional[float] = config.get("move_time")
+    game_time: Optional[float] = config.get("game_time")
+    if config.get("batch", False) and (move_time is not None or game_time is not None):
+        logger.warning("Batch games are not under time control, ignoring the time limits")
+    # only unseeded games are played by these agents; seeded games create their own in
+    # the worker processes, and batch games use the NumPy engine
+    serial = not config.get("batch", False) and config.get("seed") is None
+    agent_dict: Dict[int, Agent] = {}
+    if serial:
+        agent_dict = {
+            1: createAgent(ccgame, agent1_type, move_time, game_time),
+            2: createAgent(ccgame, agent2_type, move_time, game_time),
+        }
 
     # try get agent1.params
     try:
-        params = agent_dict[1].__getattribute__("params")
+        if serial:
+            params = agent_dict[1].__getattribute__("params")
+        else:
+            params = getAgentCls(agent1_type)(ccgame).__getattribute__("params")
     except AttributeError:
         params = None
 
@@ -225,38 +757,88 @@ def callback(
 
     num_games: int = config.get("num_games", 1)  # type: ignore
 
-    results = simulateMultipleGames(agent_dict, num_games, ccgame)
-
-    parsed_results = [r._asdict() for r in results]
-    no_time_series = False
-    if no_time_series:
-        for r in parsed_results:
-            r.pop("iter_time_list")
-    else:
-        for r in parsed_results:
-            # pick the odd number of iterations as the player 1's time
-            player1_series = r["iter_time_list"][::2]
-            # avg and var
-            r["player1_time_avg"] = np.mean(player1_series)
-            r["player1_time_var"] = np.var(player1_series)
-            # high 10%, 5%, 1%
-            r["player1_time_high10"] = np.percentile(player1_series, 90)
-            r["player1_time_high5"] = np.percentile(player1_series, 95)
-            r["player1_time_high1"] = np.percentile(player1_series, 99)
-
-
-
-    overview = {
-        "player1_wins": sum(1 for r in results if r.winner == 1),
-        "player2_wins": sum(1 for r in results if r.winner == 2),
-        "ties": sum(1 for r in results if r.winner == 0),
-        "match_iter_avg": np.mean([r.iter for r in results]),
-        "match_iter_var": np.var([r.iter for r in results]),
-        "match_time_avg": np.mean([r.time_used for r in results]),
-        "match_time_var": np.var([r.time_used for r in results]),
-        "player1_time_avg": np.mean([r["player1_time_avg"] for r in parsed_results]),
-    }
-
+    # Every game is appended to the results stream as soon as it finishes, so a crash
+    # only loses the games in progress. When resuming, the games already recorded for
+    # the same configuration are skipped.
+    fingerprint = configFingerprint(config)
+    results_path = log_dir / "results.jsonl" if log_dir is not None else None
+    recorded: Dict[int, Dict[str, Any]] = {}
+    if results_path is not None and config.get("resume"):
+        recorded = readResultStream(results_path, fingerprint)
+        logger.info(f"Resuming with {len(recorded)} of {num_games} games recorded")
+    remaining = [i for i in range(num_games) if i not in recorded]
+    stream = None
+    if results_path is not None:
+        trimResultStream(results_path)
+        stream = open(results_path, "a")
+
+    def on_result(i: int, result: Run_game_result) -> None:
+        record = parseResult(result)
+        record["game"] = remaining[i]
+        record["config"] = fingerprint
+        if result.replay is not None and log_dir is not None:
+            replay_name = f"replays/game_{remaining[i]:05d}.ccr"
+            (log_dir / "replays").mkdir(exist_ok=True)
+            with open(log_dir / replay_name, "wb") as f:
+                f.write(result.replay)
+            record["replay"] = replay_name
+        if stream is not None:
+            stream.write(json.dumps(record) + "\n")
+            stream.flush()
+        else:
+            recorded[remaining[i]] = record
+
+    seed: Optional[int] = config.get("seed")
+    log_board_every: int = config.get("log_board_every", 1)  # type: ignore
+    try:
+        if config.get("batch", False):
+            simulateBatchGames(
+                agent1_type,
+                agent2_type,
+                len(remaining),
+                ccgame,
+                batch_size=config.get("batch_size", 1000),
+                seed=seed,
+                on_result=on_result,
+            )
+        elif seed is None:
+            simulateMultipleGames(
+                agent_dict,
+                len(remaining),
+                ccgame,
+                # in viewer mode the games only publish their boards, see startWatchedGames
+                None if config.get("viewer", False) else display_board,
+                on_result=on_result,
+                log_board_every=log_board_every,
+            )
+        else:
+            specs = [
+                Game_spec(
+                    index=i,
+                    seed=f"{seed}:{i}",
+                    board_size=ccgame.size,
+                    piece_rows=ccgame.piece_rows,
+                    player1=agent1_type,
+                    player2=agent2_type,
+                    log_board_every=log_board_every,
+                    move_time=move_time,
+                    game_time=game_time,
+                )
+                for i in remaining
+            ]
+            simulateSeededGames(specs, workers, on_result=on_result)
+    finally:
+        if stream is not None:
+            stream.close()
+        for agent in agent_dict.values():
+            agent.close()
+
+    # the overview is recomputed from the stream, which includes the resumed games
+    if results_path is not None:
+        recorded = readResultStream(results_path, fingerprint)
+    parsed_results = [recorded[i] for i in sorted(recorded) if i < num_games]
+    overview = summarizeResults(parsed_results)
+    timing = summarizeTimings(parsed_results, {1: agent1_type, 2: agent2_type})
 
     if log_dir is not None:
         with open(log_dir / "results.json", "w") as f:
@@ -264,6 +846,7 @@ def callback(
                 {
                     "params": params,
                     "overview": overview,
+                    "timing": timing,
                     "results": parsed_results,
                 },
                 f,
@@ -272,14 +855,61 @@ def callback(
 
     logger.info("====================")
     logger.info(f"Overview: {overview}")
+    for player_timing in timing.values():
+        if not player_timing["phases"]:
+            continue  # batch games are not timed per phase
+        phases = ", ".join(
+            f"{phase} {stats['mean'] * 1000:.3f} ms" for phase, stats in player_timing["phases"].items()
+        )
+        logger.info(f"Mean ply phases of {player_timing['agent']}: {phases}")
     logger.info(f"Results have been saved to {log_dir}")
 
-    if config.get("direct_exit", False):
+    if config.get("direct_exit", False) and not config.get("viewer", False):
         # exit directly by destroying the root window
         if root is not None:
             root.destroy()
 
 
+def startWatchedGames(
+    ccgame: ChineseChecker,
+    config: Dict[str, Any],
+    log_dir: Optional[pathlib.Path] = None,
+) -> threading.Thread:
+    """
+    Runs callback in a worker thread, so that the games run at full speed while the
+    window shows the boards they publish (see GameBoard.watch).
+
+    Args:
+        ccgame (ChineseChecker): The game instance.
+        config (dict): The run configuration.
+        log_dir (pathlib.Path, optional): The directory to save the results to.
+
+    Returns:
+        threading.Thread: The thread running the games.
+    """
+    global B
+    if B is not None:
+        # started by the button, which has to be destroyed from the Tk thread
+        B.destroy()
+        B = None
+
+    worker = threading.Thread(
+        target=callback,
+        kwargs={"ccgame": ccgame, "config": config, "log_dir": log_dir},
+        daemon=True,
+    )
+    worker.start()
+
+    def waitForGames():
+        if worker.is_alive():
+            root.after(200, waitForGames)
+        elif config.get("direct_exit", False):
+            root.destroy()
+
+    root.after(200, waitForGames)
+    return worker
+
+
 
 def getAgentCls(agent_name: str) -> Callable[..., Agent]:
     if agent_name == "RandomAgent":
@@ -288,9 +918,41 @@ def getAgentCls(agent_name: str) -> Callable[..., Agent]:
         return SimpleGreedyAgent
     if agent_name == "YourAgent":
         return YourAgent
+    if agent_name == "AlphaBetaAgent":
+        return AlphaBetaAgent
+    if agent_name == "MCTSAgent":
+        return MCTSAgent
     raise Exception(f"Unknown agent name: {agent_name}")
 
 
+def createAgent(
+    ccgame: ChineseChecker,
+    agent_name: str,
+    move_time: Optional[float] = None,
+    game_time: Optional[float] = None,
+    seeded: bool = False,
+) -> Agent:
+    """
+    Creates an agent, under time control if a time limit is given.
+
+    Args:
+        ccgame (ChineseChecker): The game instance.
+        agent_name (str): The name of the agent class.
+        move_time (float, optional): The time limit of one move in seconds.
+        game_time (float, optional): The total time of the agent in one game in seconds.
+        seeded (bool): Whether to seed the worker process of a timed agent from the
+            random module, for seeded tournaments.
+
+    Returns:
+        Agent: The agent, or a TimedAgent running it in a worker process.
+    """
+    agent_cls = getAgentCls(agent_name)
+    if move_time is None and game_time is None:
+        return agent_cls(ccgame)
+    seed = random.getrandbits(32) if seeded else None
+    return TimedAgent(ccgame, agent_cls, move_time, game_time, seed=seed)
+
+
 def parser():
     _parser = argparse.ArgumentParser(description="Chinese Checkers")
     _parser.add_argument(
@@ -318,6 +980,88 @@ def parser():
         action="store_true",
         help="Exit the game directly without having to close the window or ctrl+c.",
     )
+    _parser.add_argument(
+        "--workers",
+        "-j",
+        type=int,
+        default=None,
+        help="Number of worker processes to play the games in. Every game then gets a "
+        "fresh game, fresh agents and its own seed (see --seed). "
+        "This overrides the same parameter in the config file.",
+    )
+    _parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed of a reproducible tournament: game i is seeded with '<seed>:<i>', so "
+        "results do not depend on the number of workers. Seeded games are not drawn. "
+        "This overrides the same parameter in the config file.",
+    )
+    _parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Play the games in lockstep batches with the vectorized NumPy engine. "
+        "Only RandomAgent and SimpleGreedyAgent are supported. The games are not drawn.",
+    )
+    _parser.add_argument(
+        "--viewer",
+        action="store_true",
+        help="Run the games in a background thread at full speed, while the window "
+        "shows their latest board at a capped frame rate (see --fps).",
+    )
+    _parser.add_argument(
+        "--fps",
+        type=int,
+        default=None,
+        help="Maximum frame rate of --viewer. "
+        "This overrides the same parameter in the config file.",
+    )
+    _parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run the games without a window: no tkinter, no drawing and no delays. "
+        "Implies --direct-start and --direct-exit.",
+    )
+    _parser.add_argument(
+        "--log-board-every",
+        type=int,
+        default=None,
+        metavar="K",
+        help="Dump the board to the log every K iterations, or only at the end of each "
+        "game if 0. This overrides the same parameter in the config file.",
+    )
+    _parser.add_argument(
+        "--async-log",
+        action="store_true",
+        help="Write the log from a background thread, so that the games do not wait "
+        "for file I/O.",
+    )
+    _parser.add_argument(
+        "--move-time",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Time limit of every move. The agents then run in their own processes, and "
+        "a move that runs out of time falls back to the agent's best move so far. This "
+        "overrides the same parameter in the config file.",
+    )
+    _parser.add_argument(
+        "--game-time",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Total time of each agent in one game, under the same rules as --move-time. "
+        "This overrides the same parameter in the config file.",
+    )
+    _parser.add_argument(
+        "--resume",
+        type=str,
+        default=None,
+        metavar="LOG_DIR",
+        help="Continue the run logged in LOG_DIR: games already in its results.jsonl "
+        "for the same game settings and seed are skipped, and new results are appended. "
+        "The seed of that run is reused unless one is given.",
+    )
     _parser.add_argument(
         "--title",
         type=str,
@@ -334,8 +1078,33 @@ def get_config():
         config: Dict[str, Any] = yaml.safe_load(config_file)
     if args.num_games is not None:
         config["num_games"] = args.num_games
-    config["direct_start"] = args.direct_start
-    config["direct_exit"] = args.direct_exit
+    if args.workers is not None:
+        config["workers"] = args.workers
+    if args.seed is not None:
+        config["seed"] = args.seed
+    if args.batch:
+        config["batch"] = True
+    if args.viewer:
+        config["viewer"] = True
+    if args.fps is not None:
+        config["viewer_fps"] = args.fps
+    if args.log_board_every is not None:
+        config["log_board_every"] = args.log_board_every
+    if args.async_log:
+        config["async_log"] = True
+    if args.move_time is not None:
+        config["move_time"] = args.move_time
+    if args.game_time is not None:
+        config["game_time"] = args.game_time
+    if args.resume is not None:
+        config["resume"] = args.resume
+        previous_config_path = pathlib.Path(args.resume) / "run_config.yaml"
+        if config.get("seed") is None and previous_config_path.exists():
+            with open(previous_config_path, "r") as f:
+                config["seed"] = yaml.safe_load(f).get("seed")
+    config["headless"] = args.headless
+    config["direct_start"] = args.direct_start or args.headless
+    config["direct_exit"] = args.direct_exit or args.headless
     config["title"] = args.title
     return config
 
@@ -347,34 +1116,62 @@ if __name__ == "__main__":
 
     config = get_config()
 
-    log_dir = pathlib.Path("logs")
-    run_name = datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + f"_{config['title']}"
-    log_dir = log_dir / run_name
+    if config.get("resume"):
+        log_dir = pathlib.Path(config["resume"])
+    else:
+        log_dir = pathlib.Path("logs")
+        run_name = datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + f"_{config['title']}"
+        log_dir = log_dir / run_name
     log_dir.mkdir(parents=True, exist_ok=True)
 
+    log_handlers: List[logging.Handler] = [
+        logging.FileHandler(log_dir / "run.log"),
+        TqdmLoggingHandler(),
+    ]
+    log_listener = None
+    if config.get("async_log", False):
+        # records are formatted by the game, then written by the listener's thread;
+        # a process queue also collects the records of forked worker processes
+        log_queue = multiprocessing.Queue()
+        log_listener = logging.handlers.QueueListener(log_queue, *log_handlers)
+        log_listener.start()
+        log_handlers = [logging.handlers.QueueHandler(log_queue)]
+
     logging.basicConfig(
         level=logging.DEBUG,
         format="%(asctime)s - %(name)-10.10s - [%(levelname)-5.5s] %(message)s",
-        handlers=[
-            logging.FileHandler(log_dir / "run.log"),
-            TqdmLoggingHandler(),
-        ]
+        handlers=log_handlers,
     )
 
     ccgame = ChineseChecker(
         size=config.get("board_size", 10), piece_rows=config.get("piece_rows", 4)
     )
-    root = tk.Tk()
-    display_board = GameBoard(root, ccgame.size, ccgame.size * 2 - 1, ccgame.board)
-    display_board.pack(side="top", fill="both", expand=True, padx=4, pady=4)
 
-    if config.get("direct_start", False):
-        callback(ccgame=ccgame, config=config, log_dir=log_dir)
-    else:
-        B = tk.Button(
-            display_board,
-            text="Start",
-            command=lambda: callback(ccgame=ccgame, config=config, log_dir=log_dir),
-        )
-        B.pack()
-    root.mainloop()
+    try:
+        if config["headless"]:
+            callback(ccgame=ccgame, config=config, log_dir=log_dir)
+        else:
+            import tkinter as tk
+            from UI import GameBoard
+
+            root = tk.Tk()
+            display_board = GameBoard(root, ccgame.size, ccgame.size * 2 - 1, ccgame.board)
+            display_board.pack(side="top", fill="both", expand=True, padx=4, pady=4)
+
+            if config.get("viewer", False):
+                fps = config.get("viewer_fps", 30)
+                setFrameQueue(multiprocessing.Queue(maxsize=4), 1 / fps)
+                display_board.watch(frame_queue, fps)
+                start = lambda: startWatchedGames(ccgame=ccgame, config=config, log_dir=log_dir)
+            else:
+                start = lambda: callback(ccgame=ccgame, config=config, log_dir=log_dir)
+
+            if config.get("direct_start", False):
+                start()
+            else:
+                B = tk.Button(display_board, text="Start", command=start)
+                B.pack()
+            root.mainloop()
+    finally:
+        if log_listener is not None:
+            log_listener.stop()
@@ -0,0 +1,285 @@
+"""
+This module defines the time control of tournaments: every agent runs in its own
+persistent worker process, and runGame talks to it through a proxy agent that enforces a
+clock per move and per game.
+
+When an agent runs out of time, the move falls back to the best move the agent reported
+so far (see Agent.report), or else to a random legal move, and the worker process is
+replaced, since it may still be busy with the abandoned search. A worker process that
+dies costs its agent the move in the same way, and is replaced. Workers send their log
+records to their TimedAgent, which emits them in the main process.
+
+Classes:
+    TimedAgent: An agent proxy that runs an agent in a worker process under a clock.
+"""
+
+import logging
+import logging.handlers
+import multiprocessing
+import random
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+import game
+from agent import Agent
+
+logger = logging.getLogger(__name__)
+
+
+class _PipeLogHandler(logging.handlers.QueueHandler):
+    """
+    Sends the log records of a worker process to its TimedAgent, which emits them.
+
+    The worker may be terminated at any time, so it must not write to handlers that
+    share a lock with other processes, like tqdm's or a multiprocessing queue's: a lock
+    held by a terminated process is never released.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.send(("log", record))
+
+
+def _serveAgent(
+    conn: Any,
+    agent_cls: Callable[..., Agent],
+    size: int,
+    piece_rows: int,
+    seed: Optional[int],
+) -> None:
+    """
+    The main loop of a worker process: builds the agent, then answers requests until it
+    receives None.
+
+    Requests are ("action", state, time budget), ("opp_action", state, time budget) and
+    ("new_game",). Answers are ("ready", params) once at the start, any number of
+    ("best", action) reports while thinking, then ("move", action) or ("error", message).
+    ("log", record) messages can come at any time.
+    """
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(_PipeLogHandler(conn))
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    ccgame = game.ChineseChecker(size, piece_rows)
+    agent = agent_cls(ccgame)
+    agent.reporter = lambda action: conn.send(("best", action))
+    conn.send(("ready", getattr(agent, "params", None)))
+    try:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            if request[0] == "new_game":
+                agent.newGame()
+                continue
+            kind, state, agent.time_budget = request
+            try:
+                if kind == "action":
+                    agent.getAction(state)
+                    conn.send(("move", agent.action))
+                else:
+                    agent.oppAction(state)
+                    conn.send(("move", agent.opp_action))
+            except Exception as e:
+                conn.send(("error", repr(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        agent.close()
+
+
+class TimedAgent(Agent):
+    """
+    TimedAgent plays the moves of another agent, which runs in a worker process, under
+    a time limit per move and a clock per game.
+
+    The worker process is started once and reused for all moves and games, and only
+    replaced after a timeout. The time of a move is measured in this process, so it
+    includes the cost of sending the state to the worker.
+    """
+
+    def __init__(
+        self,
+        game: game.ChineseChecker,
+        agent_cls: Callable[..., Agent],
+        move_time: Optional[float] = None,
+        game_time: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Starts the worker process of the agent.
+
+        Args:
+            game (ChineseChecker): The game instance.
+            agent_cls (class): The agent class to run, constructed in the worker with
+                its own game instance of the same configuration.
+            move_time (float, optional): The time limit of one move in seconds.
+            game_time (float, optional): The total time of this agent in one game.
+            seed (int, optional): The seed of the worker's random number generators.
+        """
+        super().__init__(game)
+        self.agent_cls = agent_cls
+        self.move_time = move_time
+        self.game_time = game_time
+        self.seed = seed
+        self.name = agent_cls.__name__
+        self.clock = game_time
+        # moves of the current game that ran out of time or lost the worker, and worker
+        # restarts so far
+        self.game_timeouts = 0
+        self.restarts = 0
+        self._process = None
+        self._conn = None
+        self.params = None
+        self._start()
+
+    def _start(self) -> None:
+        # the pipe and process of a fresh worker, which reports its agent's params
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serveAgent,
+            args=(child_conn, self.agent_cls, self.game.size, self.game.piece_rows, self.seed),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        try:
+            self.params = self._receive()[1]
+        except (EOFError, OSError):
+            self._process.join()
+            raise Exception(
+                f"The worker of {self.name} exited with code {self._process.exitcode} "
+                "before it was ready"
+            )
+
+    def _receive(self) -> Any:
+        # the next message of the worker, after emitting the log records before it
+        while True:
+            message = self._conn.recv()
+            if message[0] != "log":
+                return message
+            self._emit(message[1])
+
+    @staticmethod
+    def _emit(record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+    def _restart(self) -> None:
+        self._process.terminate()
+        self._process.join()
+        self._conn.close()
+        self.restarts += 1
+        self._start()
+
+    def newGame(self) -> None:
+        """
+        Resets the game clock and the timeout count, and tells the agent a new game starts.
+        """
+        self.clock = self.game_time
+        self.game_timeouts = 0
+        try:
+            self._conn.send(("new_game",))
+        except OSError:
+            # the worker died since the last move; a fresh one starts a new game anyway
+            logger.warning(f"The worker of {self.name} died, restarting it")
+            self._restart()
+
+    def getAction(self, state: game.State):
+        """
+        Asks the worker for its move, within the time left.
+        """
+        self.action = self._ask("action", state)
+
+    def oppAction(self, state: game.State):
+        """
+        Asks the worker for its bonus move, within the time left.
+        """
+        self.opp_action = self._ask("opp_action", state)
+
+    def _ask(self, kind: str, state: game.State) -> game.Action:
+        """
+        Sends a request to the worker and waits for the move until the time runs out.
+
+        Args:
+            kind (str): "action" or "opp_action".
+            state (tuple): The state to move in.
+
+        Returns:
+            tuple: The agent's move, or the fallback move after a timeout or an error.
+        """
+        limits = [t for t in (self.move_time, self.clock) if t is not None]
+        budget = min(limits) if limits else None
+        self.timed_out = False
+        start = time.perf_counter()
+        best = None
+        failure = ""
+        crashed = False
+        if budget is not None and budget <= 0:
+            self.timed_out = True
+            failure = "has no time left on its game clock"
+        else:
+            deadline = None if budget is None else start + budget
+            try:
+                self._conn.send((kind, state, budget))
+                while True:
+                    timeout = None if deadline is None else deadline - time.perf_counter()
+                    if timeout is not None and (
+                        timeout <= 0 or not self._conn.poll(timeout)
+                    ):
+                        self.timed_out = True
+                        failure = f"ran out of its {budget:.3f}s for this move"
+                        break
+                    message = self._conn.recv()
+                    if message[0] == "log":
+                        self._emit(message[1])
+                        continue
+                    if message[0] == "best":
+                        best = message[1]
+                        continue
+                    if message[0] == "move":
+                        if self.clock is not None:
+                            self.clock -= time.perf_counter() - start
+                        return message[1]
+                    failure = f"failed: {message[1]}"
+                    break
+            except (EOFError, OSError):
+                # the worker process died, e.g. killed for its memory or by a crash
+                crashed = True
+                self.timed_out = True
+                self._process.join(timeout=1)
+                failure = f"lost its worker process (exit code {self._process.exitcode})"
+
+        if self.clock is not None:
+            self.clock -= time.perf_counter() - start
+        if self.timed_out:
+            self.game_timeouts += 1
+            if crashed or budget is not None and budget > 0:
+                # the worker is dead, or may still be thinking about the abandoned move
+                self._restart()
+        logger.warning(f"{self.name} {failure}, playing a fallback move")
+        if best is not None and self.game.is_legal(state, best):
+            return best
+        if len(state) > 2 and state[2]:
+            return random.choice(self.game.opp_actions(state))
+        return random.choice(self.game.actions(state))
+
+    def close(self) -> None:
+        """
+        Stops the worker process.
+        """
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(timeout=1)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._conn.close()
+        self._process = None
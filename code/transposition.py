@@ -0,0 +1,127 @@
+"""
+This module defines a bounded transposition table for game-tree search.
+
+Positions are identified by ChineseChecker.state_key, the incremental Zobrist hash of
+the board, the bonus-move flags and the player to move.
+
+Classes:
+    TranspositionTable: A fixed-size hash table of search results with two slots per bucket.
+"""
+
+from collections import namedtuple
+from typing import Any, List, Optional
+
+
+# Kinds of stored values: an exact score, or a lower / upper bound from a cutoff.
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
+Tt_entry = namedtuple(
+    "Tt_entry",
+    ["key", "depth", "value", "flag", "move", "generation"],
+)
+
+
+class TranspositionTable(object):
+    """
+    A transposition table with a depth-preferred and an always-replace slot per bucket.
+
+    The depth-preferred slot keeps the deepest result seen for its bucket during the
+    current search, and the always-replace slot takes everything else, so shallow recent
+    results do not evict expensive deep ones and the table never refuses a store.
+    Entries left over from earlier searches (see new_search) can always be replaced.
+    """
+
+    def __init__(self, size_bits: int = 16):
+        """
+        Initializes an empty table.
+
+        Args:
+            size_bits (int): The table has 2 ** size_bits buckets of two entries each.
+        """
+        self.num_buckets = 1 << size_bits
+        self._mask = self.num_buckets - 1
+        self._deep: List[Optional[Tt_entry]] = [None] * self.num_buckets
+        self._recent: List[Optional[Tt_entry]] = [None] * self.num_buckets
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self) -> None:
+        """
+        Marks the start of a new search, so that older entries lose their priority.
+        """
+        self.generation += 1
+
+    def clear(self) -> None:
+        """
+        Removes all entries and resets the statistics.
+        """
+        self._deep = [None] * self.num_buckets
+        self._recent = [None] * self.num_buckets
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def probe(self, key: int) -> Optional[Tt_entry]:
+        """
+        Looks up a position.
+
+        Args:
+            key (int): The Zobrist key of the position.
+
+        Returns:
+            Tt_entry: The stored entry, or None if the position is not in the table.
+        """
+        self.probes += 1
+        index = key & self._mask
+        entry = self._deep[index]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        entry = self._recent[index]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(
+        self, key: int, depth: int, value: float, flag: int, move: Any = None
+    ) -> None:
+        """
+        Stores a search result.
+
+        Args:
+            key (int): The Zobrist key of the position.
+            depth (int): The remaining search depth the value was computed with.
+            value (float): The score of the position.
+            flag (int): TT_EXACT, TT_LOWER or TT_UPPER.
+            move (tuple, optional): The best move found in the position.
+        """
+        self.stores += 1
+        index = key & self._mask
+        entry = Tt_entry(key, depth, value, flag, move, self.generation)
+        deep = self._deep[index]
+        if (
+            deep is None
+            or deep.key == key
+            or deep.generation != self.generation
+            or depth >= deep.depth
+        ):
+            self._deep[index] = entry
+            recent = self._recent[index]
+            if recent is not None and recent.key == key:
+                self._recent[index] = None
+        else:
+            self._recent[index] = entry
+
+    def hit_rate(self) -> float:
+        """
+        Returns the fraction of probes that found their position.
+
+        Returns:
+            float: The hit rate, or 0.0 if the table has not been probed.
+        """
+        return self.hits / self.probes if self.probes else 0.0